@@ -19,3 +19,112 @@ class Config(object):
     OAUTHLIB_INSECURE_TRANSPORT = getenv('OAUTHLIB_INSECURE_TRANSPORT', 1) # only for local testing
     GOOGLE_CLIENT_SECRETS_FILE = getenv('CLIENT_SECRETS_FILE', 'gmail_secret.json')
     GOOGLE_REDIRECT_URI = getenv('GOOGLE_REDIRECT_URI', 'http://localhost:8000/')
+
+    # shared keep-alive pool per LLM provider
+    LLM_POOL_MAX_CONNECTIONS = int(getenv('LLM_POOL_MAX_CONNECTIONS', 100))
+    LLM_POOL_MAX_KEEPALIVE = int(getenv('LLM_POOL_MAX_KEEPALIVE', 20))
+    LLM_POOL_KEEPALIVE_EXPIRY = float(getenv('LLM_POOL_KEEPALIVE_EXPIRY', 60))
+
+    # in-process pre-router in front of the supervisor LLM
+    PREROUTER_ENABLED = getenv('PREROUTER_ENABLED', 'true').lower() == 'true'
+    PREROUTER_MIN_CONFIDENCE = float(getenv('PREROUTER_MIN_CONFIDENCE', 0.8))
+    PREROUTER_SHADOW_RATE = float(getenv('PREROUTER_SHADOW_RATE', 0.0)) # share of hits re-checked by the LLM
+
+    # response cache for repeated phrasings
+    RESPONSE_CACHE_AGENTS = getenv('RESPONSE_CACHE_AGENTS', 'supervisor,chitchat_agent') # comma separated opt-in list
+    RESPONSE_CACHE_MAX_SIZE = int(getenv('RESPONSE_CACHE_MAX_SIZE', 1024))
+    RESPONSE_CACHE_TTL = float(getenv('RESPONSE_CACHE_TTL', 3600))
+    RESPONSE_CACHE_SIMILARITY = float(getenv('RESPONSE_CACHE_SIMILARITY', 0.8))
+    RESPONSE_CACHE_MONGO = getenv('RESPONSE_CACHE_MONGO', 'false').lower() == 'true'
+
+    # admission control for chat turns and outbound LLM calls
+    CHAT_MAX_CONCURRENCY = int(getenv('CHAT_MAX_CONCURRENCY', 32))
+    CHAT_MAX_QUEUE = int(getenv('CHAT_MAX_QUEUE', 64))
+    CHAT_QUEUE_TIMEOUT = float(getenv('CHAT_QUEUE_TIMEOUT', 10))
+    LLM_PROVIDER_CONCURRENCY = int(getenv('LLM_PROVIDER_CONCURRENCY', 8))
+    LLM_PROVIDER_MAX_QUEUE = int(getenv('LLM_PROVIDER_MAX_QUEUE', 128))
+
+    # persisted conversation state
+    CHECKPOINTS_ENABLED = getenv('CHECKPOINTS_ENABLED', 'true').lower() == 'true'
+    CHECKPOINT_KEEP_LAST = int(getenv('CHECKPOINT_KEEP_LAST', 5))
+    CHECKPOINT_TTL = int(getenv('CHECKPOINT_TTL', 7 * 24 * 3600))
+
+    # prompt history management
+    HISTORY_KEEP_TURNS = int(getenv('HISTORY_KEEP_TURNS', 3))
+    HISTORY_TOKEN_BUDGET = int(getenv('HISTORY_TOKEN_BUDGET', 2000)) # for agents without their own budget
+    HISTORY_SUMMARY_TOKENS = int(getenv('HISTORY_SUMMARY_TOKENS', 300))
+
+    # loop guard for the agent graphs
+    AGENT_GRAPH_MAX_STEPS = int(getenv('AGENT_GRAPH_MAX_STEPS', 12))
+    AGENT_GRAPH_MAX_NODE_VISITS = int(getenv('AGENT_GRAPH_MAX_NODE_VISITS', 3))
+    POLLING_GRAPH_MAX_STEPS = int(getenv('POLLING_GRAPH_MAX_STEPS', 6))
+    POLLING_GRAPH_MAX_NODE_VISITS = int(getenv('POLLING_GRAPH_MAX_NODE_VISITS', 2))
+
+    # background Gmail polling for all connected users
+    GMAIL_POLLER_ENABLED = getenv('GMAIL_POLLER_ENABLED', 'false').lower() == 'true'
+    GMAIL_POLL_WORKERS = int(getenv('GMAIL_POLL_WORKERS', 16))
+    GMAIL_POLL_INTERVAL = float(getenv('GMAIL_POLL_INTERVAL', 60)) # seconds between polls of the same user
+    GMAIL_POLL_JITTER = float(getenv('GMAIL_POLL_JITTER', 0.2)) # fraction of the interval
+    GMAIL_API_RATE = float(getenv('GMAIL_API_RATE', 50)) # Gmail API calls per second, across users
+    GMAIL_PER_USER_CONCURRENCY = int(getenv('GMAIL_PER_USER_CONCURRENCY', 4))
+    GMAIL_ROSTER_REFRESH = float(getenv('GMAIL_ROSTER_REFRESH', 300))
+
+    # Google API discovery documents
+    DISCOVERY_CACHE_DIR = getenv('DISCOVERY_CACHE_DIR', '.cache/google_discovery')
+    DISCOVERY_CACHE_TTL = float(getenv('DISCOVERY_CACHE_TTL', 7 * 24 * 3600)) # revalidate with the ETag after this
+
+    # incremental Gmail sync
+    GMAIL_HISTORY_MAX_PAGES = int(getenv('GMAIL_HISTORY_MAX_PAGES', 10))
+    GMAIL_RESYNC_MAX_MESSAGES = int(getenv('GMAIL_RESYNC_MAX_MESSAGES', 50)) # bound for a full resync when the history id expired
+    GMAIL_BATCH_ENABLED = getenv('GMAIL_BATCH_ENABLED', 'true').lower() == 'true'
+    GMAIL_BATCH_SIZE = int(getenv('GMAIL_BATCH_SIZE', 50)) # messages per batch request, at most 100
+    PROCESSED_EMAIL_CACHE_SIZE = int(getenv('PROCESSED_EMAIL_CACHE_SIZE', 10000))
+    EMAIL_BODY_MAX_CHARS = int(getenv('EMAIL_BODY_MAX_CHARS', 20000)) # body text kept per email, before URL extraction
+
+    # CPU-heavy work off the event loop
+    CPU_OFFLOAD_ENABLED = getenv('CPU_OFFLOAD_ENABLED', 'true').lower() == 'true'
+    CPU_POOL_KIND = getenv('CPU_POOL_KIND', 'process') # process or thread
+    CPU_POOL_WORKERS = int(getenv('CPU_POOL_WORKERS', 2))
+    CPU_POOL_MAX_QUEUE = int(getenv('CPU_POOL_MAX_QUEUE', 32))
+    CPU_OFFLOAD_MIN_BYTES = int(getenv('CPU_OFFLOAD_MIN_BYTES', 16384)) # smaller message bodies are parsed inline
+    LOOP_LAG_INTERVAL = float(getenv('LOOP_LAG_INTERVAL', 0.5))
+
+    # email triage before the email agent LLM
+    TRIAGE_ENABLED = getenv('TRIAGE_ENABLED', 'true').lower() == 'true'
+    TRIAGE_THRESHOLD = float(getenv('TRIAGE_THRESHOLD', 0.9)) # default ignore probability, users can override
+    TRIAGE_EXPLORE_RATE = float(getenv('TRIAGE_EXPLORE_RATE', 0.05)) # share of reputation-ignored mail still sent to the LLM
+
+    # batched email analysis for polled emails
+    EMAIL_BATCH_MAX_EMAILS = int(getenv('EMAIL_BATCH_MAX_EMAILS', 10))
+    EMAIL_BATCH_TOKEN_BUDGET = int(getenv('EMAIL_BATCH_TOKEN_BUDGET', 6000)) # estimated tokens of email content per call
+
+    # Gmail push notifications (Pub/Sub), polling becomes a slow fallback
+    GMAIL_PUSH_ENABLED = getenv('GMAIL_PUSH_ENABLED', 'false').lower() == 'true'
+    GMAIL_PUSH_TOPIC = getenv('GMAIL_PUSH_TOPIC', '') # projects/<project>/topics/<topic>, users.watch is skipped when empty
+    GMAIL_PUSH_TOKEN = getenv('GMAIL_PUSH_TOKEN', '') # shared secret expected as ?token= on the push endpoint
+    GMAIL_PUSH_FALLBACK_INTERVAL = float(getenv('GMAIL_PUSH_FALLBACK_INTERVAL', 3600))
+
+    # parallel agent branches for multi-intent turns
+    FANOUT_ENABLED = getenv('FANOUT_ENABLED', 'true').lower() == 'true'
+
+    # speculative start of the likely next agent while the supervisor LLM decides
+    SPECULATION_ENABLED = getenv('SPECULATION_ENABLED', 'false').lower() == 'true'
+    SPECULATIVE_AGENTS = getenv('SPECULATIVE_AGENTS', 'chitchat_agent') # comma separated, side-effect free agents only
+    SPECULATION_WASTE_BUDGET = int(getenv('SPECULATION_WASTE_BUDGET', 20000)) # estimated tokens per hour spent on discarded runs
+
+    # LLM backend failover and hedging
+    LLM_MAX_RETRIES = int(getenv('LLM_MAX_RETRIES', 1)) # per client, failover to the next backend handles the rest
+    LLM_TIMEOUT = float(getenv('LLM_TIMEOUT', 30))
+    LLM_BREAKER_FAILURES = int(getenv('LLM_BREAKER_FAILURES', 3)) # consecutive failures before a backend is skipped
+    LLM_BREAKER_COOLDOWN = float(getenv('LLM_BREAKER_COOLDOWN', 30))
+    LLM_HEDGE_ENABLED = getenv('LLM_HEDGE_ENABLED', 'false').lower() == 'true'
+    LLM_HEDGE_MIN_DELAY = float(getenv('LLM_HEDGE_MIN_DELAY', 2.0)) # never hedge sooner than this, in seconds
+    LLM_HEDGE_MIN_SAMPLES = int(getenv('LLM_HEDGE_MIN_SAMPLES', 20)) # latencies needed before the p95 is trusted
+
+    # client-side rate limits per LLM provider/model, learned from response headers
+    LLM_RATE_LIMIT_ENABLED = getenv('LLM_RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    LLM_RATE_LIMIT_RPM = float(getenv('LLM_RATE_LIMIT_RPM', 20)) # until the provider reports its limit
+    LLM_RATE_LIMIT_TPM = float(getenv('LLM_RATE_LIMIT_TPM', 0)) # 0 = no token limit until the provider reports one
+    LLM_RATE_LIMIT_OUTPUT_TOKENS = int(getenv('LLM_RATE_LIMIT_OUTPUT_TOKENS', 512)) # completion tokens assumed per call
+    LLM_RATE_LIMIT_BACKOFF = float(getenv('LLM_RATE_LIMIT_BACKOFF', 10)) # pause after a 429 without Retry-After
+    LLM_RATE_LIMIT_MAX_WAIT = float(getenv('LLM_RATE_LIMIT_MAX_WAIT', 15)) # longer waits fail over to the next backend
@@ -8,9 +8,15 @@ from fastapi.middleware.cors import CORSMiddleware
 from .router.routes import router
 from panda.router.gmail import gmail_router
 from panda.router.settings import settings_router
+from panda.router.metrics import metrics_router
 from .database.mongo.connection import mongo
 from panda.core.llm.config_manager import config_manager
-from panda.core.tools.gmail import poll_gmail_updates
+from panda.agents.registry import graph_registry
+from panda.core.llm.client_pool import client_registry
+from panda.core.tools.gmail_poller import gmail_poller
+from panda.core.tools.gmail_discovery import discovery_cache
+from panda.core.concurrency import cpu_pool, loop_lag
+from panda import Config
 
 async def some_cron_jobs():
     try:
@@ -22,10 +28,18 @@ async def some_cron_jobs():
 async def lifespan(app: FastAPI):
     await mongo.connect()
     await config_manager.load_config()
+    graph_registry.build_all()
+    loop_lag.start()
+
+    try:
+        await discovery_cache.get('gmail', 'v1')
+    except Exception as e:
+        print(f"Could not load the Gmail discovery document: {e}")
     
     cron_task = asyncio.create_task(some_cron_jobs())
 
-    #asyncio.create_task(poll_gmail_updates("test_user"))
+    if Config.GMAIL_POLLER_ENABLED or Config.GMAIL_PUSH_ENABLED:
+        await gmail_poller.start()
     
     yield
     
@@ -34,7 +48,12 @@ async def lifespan(app: FastAPI):
         await cron_task
     except asyncio.CancelledError:
         pass
-        
+
+    if gmail_poller.running:
+        await gmail_poller.stop()
+    await loop_lag.stop()
+    cpu_pool.shutdown()
+    await client_registry.aclose()
     await mongo.disconnect()
 
 
@@ -51,6 +70,7 @@ api_server.add_middleware(
 api_server.include_router(router)
 api_server.include_router(gmail_router)
 api_server.include_router(settings_router)
+api_server.include_router(metrics_router)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,68 @@
+from functools import wraps
+from typing import Callable, List, Optional
+
+from langgraph.types import Send
+
+from panda import Config
+from panda.models.agents.state import MasterState
+
+
+# Agents that can run side by side within one turn.
+# Booking always ends in human review, so it is never part of a fan-out.
+FANOUT_AGENTS = ("email_agent", "scheduler_agent", "chitchat_agent")
+
+
+def plan_fanout(next_agent: Optional[str], parallel_agents: Optional[list]) -> Optional[List[str]]:
+    """Agents to run as parallel branches for a supervisor decision, None for a single route"""
+    plan = list(dict.fromkeys([next_agent, *(parallel_agents or [])]))
+    if not Config.FANOUT_ENABLED or len(plan) < 2 or any(agent not in FANOUT_AGENTS for agent in plan):
+        return None
+    return plan
+
+
+def fanout_sends(state: MasterState) -> List[Send]:
+    """One Send per planned agent, every branch starts from the supervisor's state"""
+    return [Send(agent, {**state, "next_agent": agent}) for agent in state["fanout"]]
+
+
+def branch_node(node: Callable) -> Callable:
+    """
+    Wrap an agent node so that, inside a fan-out, it only writes what it changed.
+
+    Nodes return whole dicts ({**context, "key": ...}) and plain values they did not
+    touch; with several branches in one step, a sibling's copy of the old values
+    would revert the other's writes when the updates are merged.
+    """
+
+    @wraps(node)
+    async def branch(state: MasterState):
+        update = await node(state)
+        if not state.get("fanout"):
+            return update
+
+        delta = {}
+        for key, value in update.items():
+            old = state.get(key)
+            if isinstance(value, list):
+                delta[key] = value  # appended by their reducers
+            elif isinstance(value, dict) and isinstance(old, dict):
+                changed = {k: v for k, v in value.items() if k not in old or old[k] != v}
+                if changed:
+                    delta[key] = changed
+            elif key not in state or old != value:
+                delta[key] = value
+        return delta
+
+    return branch
+
+
+def branch_route(route: Callable) -> Callable:
+    """Wrap an agent's routing function so fan-out branches all end in the join node"""
+
+    @wraps(route)
+    def routed(state: MasterState) -> str:
+        if state.get("fanout"):
+            return "join"
+        return route(state)
+
+    return routed
@@ -1,7 +1,11 @@
 from langgraph.graph import StateGraph, END
-from typing import Literal
+from langgraph.types import Send
+from typing import List, Literal, Union
 
 from panda.models.agents.state import MasterState
+from panda.agents.loop_guard import GRAPH_LIMITS, guard_node, guard_route
+from panda.agents.fanout import fanout_sends, branch_node, branch_route
+from panda.agents.speculation import speculative
 from panda.agents.nodes.all_nodes import (
     supervisor_node,
     email_agent_node,
@@ -9,7 +13,8 @@ from panda.agents.nodes.all_nodes import (
     booking_agent_node,
     chitchat_agent_node,
     health_monitor_node,
-    human_review_node
+    human_review_node,
+    join_node
 )
 
 
@@ -17,14 +22,18 @@ from panda.agents.nodes.all_nodes import (
 # ROUTING FUNCTIONS
 # ============================================================================
 
-def route_supervisor(state: MasterState) -> str:
-    """Route from supervisor to appropriate agent"""
+def route_supervisor(state: MasterState) -> Union[str, List[Send]]:
+    """Route from supervisor to appropriate agent, or to all planned agents at once"""
     next_agent = state.get("next_agent", "chitchat_agent")
     
     # Check if human review is required
     if state.get("requires_human"):
         return "human_review"
     
+    # Independent agents of a multi-intent request run as parallel branches
+    if state.get("fanout"):
+        return fanout_sends(state)
+    
     return next_agent
 
 
@@ -106,6 +115,14 @@ def route_health_monitor(state: MasterState) -> str:
     return "supervisor"
 
 
+def route_join(state: MasterState) -> str:
+    """Route after the parallel branches of a fan-out have joined"""
+    if state.get("requires_human"):
+        return "human_review"
+    
+    return "END"
+
+
 def route_human_review(state: MasterState) -> str:
     """Route from human review back to supervisor"""
     # After human input, usually return to supervisor
@@ -123,20 +140,26 @@ def route_human_review(state: MasterState) -> str:
 # GRAPH CONSTRUCTION
 # ============================================================================
 
-def create_agent_graph():
-    """Create and compile the multi-agent graph"""
+def create_agent_graph(checkpointer=None):
+    """
+    Create and compile the multi-agent graph
+    
+    With a checkpointer, conversations persist per thread and the graph
+    pauses before human_review until feedback is provided.
+    """
     
     # Initialize graph with state schema
     workflow = StateGraph(MasterState)
     
     # Add all agent nodes
-    workflow.add_node("supervisor", supervisor_node)
-    workflow.add_node("email_agent", email_agent_node)
-    workflow.add_node("scheduler_agent", scheduler_agent_node)
-    workflow.add_node("booking_agent", booking_agent_node)
-    workflow.add_node("chitchat_agent", chitchat_agent_node)
-    #workflow.add_node("health_monitor", health_monitor_node)
-    workflow.add_node("human_review", human_review_node)
+    workflow.add_node("supervisor", guard_node("agent", "supervisor", supervisor_node))
+    workflow.add_node("email_agent", guard_node("agent", "email_agent", branch_node(speculative("email_agent", email_agent_node))))
+    workflow.add_node("scheduler_agent", guard_node("agent", "scheduler_agent", branch_node(speculative("scheduler_agent", scheduler_agent_node))))
+    workflow.add_node("booking_agent", guard_node("agent", "booking_agent", booking_agent_node))
+    workflow.add_node("chitchat_agent", guard_node("agent", "chitchat_agent", branch_node(speculative("chitchat_agent", chitchat_agent_node))))
+    #workflow.add_node("health_monitor", guard_node("agent", "health_monitor", health_monitor_node))
+    workflow.add_node("human_review", guard_node("agent", "human_review", human_review_node))
+    workflow.add_node("join", guard_node("agent", "join", join_node))
     
     # Set entry point
     workflow.set_entry_point("supervisor")
@@ -144,7 +167,7 @@ def create_agent_graph():
     # Add conditional edges from supervisor
     workflow.add_conditional_edges(
         "supervisor",
-        route_supervisor,
+        guard_route(route_supervisor),
         {
             "email_agent": "email_agent",
             "scheduler_agent": "scheduler_agent",
@@ -159,8 +182,9 @@ def create_agent_graph():
     # Email agent routing
     workflow.add_conditional_edges(
         "email_agent",
-        route_email_agent,
+        guard_route(branch_route(route_email_agent)),
         {
+            "join": "join",
             "scheduler_agent": "scheduler_agent",
             "human_review": "human_review",
             #"health_monitor": "health_monitor",
@@ -172,8 +196,9 @@ def create_agent_graph():
     # Scheduler agent routing
     workflow.add_conditional_edges(
         "scheduler_agent",
-        route_scheduler_agent,
+        guard_route(branch_route(route_scheduler_agent)),
         {
+            "join": "join",
             "human_review": "human_review",
             #"health_monitor": "health_monitor",
             "supervisor": "supervisor",
@@ -184,7 +209,7 @@ def create_agent_graph():
     # Booking agent always goes to human review
     workflow.add_conditional_edges(
         "booking_agent",
-        route_booking_agent,
+        guard_route(route_booking_agent),
         {
             "human_review": "human_review",
             "END": END
@@ -194,8 +219,9 @@ def create_agent_graph():
     # Chitchat agent routing
     workflow.add_conditional_edges(
         "chitchat_agent",
-        route_chitchat_agent,
+        guard_route(branch_route(route_chitchat_agent)),
         {
+            "join": "join",
             "email_agent": "email_agent",
             "scheduler_agent": "scheduler_agent",
             "booking_agent": "booking_agent",
@@ -215,10 +241,20 @@ def create_agent_graph():
     #    }
     #)
     
+    # Fan-out branches join here before the turn ends
+    workflow.add_conditional_edges(
+        "join",
+        guard_route(route_join),
+        {
+            "human_review": "human_review",
+            "END": END
+        }
+    )
+    
     # Human review routing
     workflow.add_conditional_edges(
         "human_review",
-        route_human_review,
+        guard_route(route_human_review),
         {
             "supervisor": "supervisor",
             "END": END
@@ -226,7 +262,16 @@ def create_agent_graph():
     )
     
     # Compile the graph
-    return workflow.compile()
+    if checkpointer is None:
+        graph = workflow.compile()
+    else:
+        graph = workflow.compile(
+            checkpointer=checkpointer,
+            interrupt_before=["human_review"]
+        )
+    
+    # Backstop only, the loop guard ends runs well before this
+    return graph.with_config(recursion_limit=GRAPH_LIMITS["agent"]["max_steps"] * 2 + 5)
 
 
 # ============================================================================
@@ -240,11 +285,13 @@ def create_polling_graph():
     
     # Simple polling flow
     async def poll_emails_node(state: MasterState):
-        """Poll for new emails"""
+        """Poll for new emails, unless the caller already fetched them"""
         from panda.core.tools.email import EmailTools
         
-        user_id = state.get("user_id")
-        emails = await EmailTools.fetch_emails(user_id, unread_only=True)
+        emails = state.get("email_data", {}).get("unprocessed_emails")
+        if emails is None:
+            user_id = state.get("user_id")
+            emails = await EmailTools.fetch_emails(user_id, unread_only=True)
         
         return {
             "email_data": {
@@ -255,10 +302,10 @@ def create_polling_graph():
             "next_agent": "email_agent" if emails else "END"
         }
     
-    poll_workflow.add_node("poll_emails", poll_emails_node)
-    poll_workflow.add_node("email_agent", email_agent_node)
-    poll_workflow.add_node("scheduler_agent", scheduler_agent_node)
-    #poll_workflow.add_node("health_monitor", health_monitor_node)
+    poll_workflow.add_node("poll_emails", guard_node("polling", "poll_emails", poll_emails_node))
+    poll_workflow.add_node("email_agent", guard_node("polling", "email_agent", email_agent_node))
+    poll_workflow.add_node("scheduler_agent", guard_node("polling", "scheduler_agent", scheduler_agent_node))
+    #poll_workflow.add_node("health_monitor", guard_node("polling", "health_monitor", health_monitor_node))
     
     # Set entry point
     poll_workflow.set_entry_point("poll_emails")
@@ -271,7 +318,7 @@ def create_polling_graph():
     
     poll_workflow.add_conditional_edges(
         "poll_emails",
-        route_poll_emails,
+        guard_route(route_poll_emails),
         {
             "email_agent": "email_agent",
             "END": END
@@ -280,7 +327,7 @@ def create_polling_graph():
     
     poll_workflow.add_conditional_edges(
         "email_agent",
-        route_email_agent,
+        guard_route(route_email_agent),
         {
             "scheduler_agent": "scheduler_agent",
             #"health_monitor": "health_monitor",
@@ -291,7 +338,9 @@ def create_polling_graph():
     poll_workflow.add_edge("scheduler_agent", END)
     #poll_workflow.add_edge("health_monitor", END)
     
-    return poll_workflow.compile()
+    return poll_workflow.compile().with_config(
+        recursion_limit=GRAPH_LIMITS["polling"]["max_steps"] * 2 + 5
+    )
 
 
 # ============================================================================
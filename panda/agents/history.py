@@ -0,0 +1,119 @@
+from typing import Dict, List
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from panda import Config
+from panda.models.agents.state import MasterState
+from panda.utils.cache import LRUCache, messages_digest
+from panda.utils.tokens import count_tokens
+
+
+# Prompt history budget per agent, in estimated tokens
+AGENT_TOKEN_BUDGETS = {
+    "supervisor": 800,
+    "chitchat_agent": 1500,
+    "email_agent": 2500,
+    "scheduler_agent": 2000,
+    "booking_agent": 2000,
+    "health_monitor": 1500,
+}
+
+SUMMARY_SNIPPET_CHARS = 160
+
+# (user-scoped thread, folded message count, digest of the folded messages) -> summary text
+_summary_cache = LRUCache(max_size=2048, ttl=3600)
+
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def _split_turns(messages: List[BaseMessage]) -> List[List[BaseMessage]]:
+    """Group messages into turns, each starting at a user message."""
+    turns: List[List[BaseMessage]] = []
+    for m in messages:
+        if isinstance(m, HumanMessage) or not turns:
+            turns.append([m])
+        else:
+            turns[-1].append(m)
+    return turns
+
+
+def _summarize(thread: str, folded: List[BaseMessage]) -> str:
+    """
+    Extractive summary of folded turns, cached per thread and fold point.
+    Clients pick conversation ids, so the thread includes the user and the key the folded content.
+    """
+    key = (thread, len(folded), messages_digest(folded))
+    summary = _summary_cache.get(key)
+    if summary is not None:
+        return summary
+
+    lines = []
+    for m in folded:
+        content = m.content if isinstance(m.content, str) else str(m.content)
+        snippet = " ".join(content.split())[:SUMMARY_SNIPPET_CHARS]
+        if snippet:
+            speaker = "User" if isinstance(m, HumanMessage) else "Assistant"
+            lines.append(f"- {speaker}: {snippet}")
+
+    # keep the most recent lines when the summary itself is over budget
+    budget_chars = Config.HISTORY_SUMMARY_TOKENS * 4
+    kept, used = [], 0
+    for line in reversed(lines):
+        if used + len(line) > budget_chars:
+            break
+        kept.append(line)
+        used += len(line)
+
+    summary = "Summary of the earlier conversation:\n" + "\n".join(reversed(kept))
+    _summary_cache.set(key, summary)
+    return summary
+
+
+def prepare_messages(agent_name: str, state: MasterState, record_stats: bool = True) -> List[BaseMessage]:
+    """
+    Bound the history sent to an agent's prompt.
+    The last HISTORY_KEEP_TURNS turns are kept verbatim while they fit the agent's token budget,
+    older turns are folded into a single summary message.
+    record_stats=False for estimates that are not sent, so history_stats only counts real calls.
+    """
+    messages = state.get("messages", [])
+    budget = AGENT_TOKEN_BUDGETS.get(agent_name, Config.HISTORY_TOKEN_BUDGET)
+    turns = _split_turns(messages)
+
+    # turns[-0:] would keep everything, HISTORY_KEEP_TURNS=0 sends the summary only
+    kept_turns = turns[-Config.HISTORY_KEEP_TURNS:] if Config.HISTORY_KEEP_TURNS else []
+    # always keep the latest turn, drop older ones until the rest fits
+    while len(kept_turns) > 1 and count_tokens([m for turn in kept_turns for m in turn]) > budget:
+        kept_turns = kept_turns[1:]
+
+    kept = [m for turn in kept_turns for m in turn]
+    folded = messages[:len(messages) - len(kept)]
+
+    prepared = kept
+    if folded:
+        summary = _summarize(f"{state.get('user_id')}:{state.get('conversation_id', '')}", folded)
+        prepared = [SystemMessage(content=summary), *kept]
+
+    if not record_stats:
+        return prepared
+
+    agent_stats = _stats.setdefault(agent_name, {"calls": 0, "tokens_full": 0, "tokens_sent": 0})
+    agent_stats["calls"] += 1
+    agent_stats["tokens_full"] += count_tokens(messages)
+    agent_stats["tokens_sent"] += count_tokens(prepared)
+
+    return prepared
+
+
+def history_stats() -> Dict[str, Dict[str, float]]:
+    """Average prompt history tokens per call, before and after trimming."""
+    report = {}
+    for agent, s in _stats.items():
+        calls = s["calls"] or 1
+        report[agent] = {
+            "calls": s["calls"],
+            "avg_tokens_full": s["tokens_full"] / calls,
+            "avg_tokens_sent": s["tokens_sent"] / calls,
+            "tokens_saved": s["tokens_full"] - s["tokens_sent"],
+        }
+    return report
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from datetime import datetime
+from functools import wraps
+from typing import Callable, Dict
+
+from langchain_core.messages import AIMessage
+
+from panda import Config
+from panda.models.agents.state import MasterState
+from panda.database.mongo.connection import mongo, COLLECTIONS
+
+logger = logging.getLogger(__name__)
+
+# route inserts in flight, the loop only keeps weak references to tasks
+_background_tasks = set()
+
+
+# Per-graph step budgets
+GRAPH_LIMITS: Dict[str, Dict[str, int]] = {
+    "agent": {
+        "max_steps": Config.AGENT_GRAPH_MAX_STEPS,
+        "max_node_visits": Config.AGENT_GRAPH_MAX_NODE_VISITS,
+    },
+    "polling": {
+        "max_steps": Config.POLLING_GRAPH_MAX_STEPS,
+        "max_node_visits": Config.POLLING_GRAPH_MAX_NODE_VISITS,
+    },
+}
+
+BUDGET_EXHAUSTED_MESSAGE = (
+    "⚠️ I stopped working on this request because it kept going around in circles. "
+    "Here is what I have so far - feel free to rephrase or give me more details."
+)
+
+
+def current_route(state: MasterState) -> list:
+    """Nodes visited during the current run, in order"""
+    run_id = state.get("run_id")
+    return [e["node"] for e in state.get("route_trace", []) if e.get("run_id") == run_id]
+
+
+def guard_node(graph_kind: str, name: str, node: Callable) -> Callable:
+    """
+    Wrap a node so every visit is traced and the run stops cleanly
+    once the graph's step budget or the node's visit budget is used up.
+    """
+    limits = GRAPH_LIMITS[graph_kind]
+
+    @wraps(node)
+    async def guarded(state: MasterState):
+        route = current_route(state)
+        trace_entry = {"run_id": state.get("run_id"), "node": name}
+
+        if len(route) >= limits["max_steps"] or route.count(name) >= limits["max_node_visits"]:
+            logger.warning(f"Step budget exhausted at '{name}' after route {route}")
+            return {
+                "next_agent": "END",
+                "requires_human": False,
+                "step_budget_exhausted": True,
+                "route_trace": [{**trace_entry, "skipped": True}],
+                "messages": [AIMessage(content=BUDGET_EXHAUSTED_MESSAGE)]
+            }
+
+        update = await node(state)
+        return {**update, "route_trace": [trace_entry]}
+
+    return guarded
+
+
+def guard_route(route: Callable) -> Callable:
+    """Wrap a routing function so an exhausted budget always ends the run"""
+
+    @wraps(route)
+    def guarded(state: MasterState) -> str:
+        if state.get("step_budget_exhausted"):
+            return "END"
+        return route(state)
+
+    return guarded
+
+
+def record_route(state: MasterState):
+    """Store the route taken by a finished run for later analysis, off the request path"""
+    if mongo.db is None:
+        return
+
+    async def _insert():
+        try:
+            await mongo.db[COLLECTIONS['agent_routes']].insert_one({
+                "run_id": state.get("run_id"),
+                "conversation_id": state.get("conversation_id"),
+                "user_id": state.get("user_id"),
+                "route": current_route(state),
+                "budget_exhausted": state.get("step_budget_exhausted", False),
+                "created_at": datetime.utcnow()
+            })
+        except Exception as e:
+            logger.error(f"Failed to record agent route: {e}")
+
+    task = asyncio.create_task(_insert())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
@@ -1,20 +1,27 @@
+import asyncio
+import random
+import logging
 from datetime import datetime
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 
-from panda.core.llm.factory import LLMFactory, LLMProvider
+from panda import Config
+from panda.core.llm.factory import LLMFactory
+from panda.core.llm.response_cache import response_cache, cache_scope
 from panda.core.llm.prompts import (
     MASTER_SUPERVISOR_PROMPT,
     EMAIL_AGENT_PROMPT,
+    EMAIL_BATCH_PROMPT,
     SCHEDULER_AGENT_PROMPT,
     BOOKING_AGENT_PROMPT,
     CHITCHAT_AGENT_PROMPT,
     HEALTH_MONITOR_PROMPT
 )
-from panda.models.agents.state import MasterState
+from panda.models.agents.state import MasterState, ResolvedActions
 from panda.models.agents.response import (
     SupervisorRouterResponse,
     EmailAgentResponse,
+    EmailBatchResponse,
     SchedulerAgentResponse,
     BookingAgentResponse,
     ChitChatResponse,
@@ -22,34 +29,99 @@ from panda.models.agents.response import (
 )
 
 from panda.core.tools.calendar import CalendarTools
+from panda.agents.prerouter import pre_router
+from panda.agents.history import prepare_messages
+from panda.utils.tokens import count_tokens
+from panda.agents.triage import email_triage
+from panda.agents.fanout import plan_fanout
+from panda.agents.speculation import speculator
+
+logger = logging.getLogger(__name__)
+
+# background tasks, the loop only keeps weak references to them
+_background_tasks = set()
+
+
+def _last_user_text(state: MasterState):
+    """Text of the latest message if it came from the user, used as the response cache key"""
+    messages = state.get("messages", [])
+    if messages and isinstance(messages[-1], HumanMessage):
+        return messages[-1].content
+    return None
 
 
 # ============================================================================
 # SUPERVISOR NODE
 # ============================================================================
 
-supervisor_llm = LLMFactory.create_client(
-    provider=LLMProvider.OPENROUTER,
-    model_name="mistralai/devstral-2512:free",
-).with_structured_output(SupervisorRouterResponse)
-
 supervisor_prompt = ChatPromptTemplate.from_messages([
     ("system", MASTER_SUPERVISOR_PROMPT),
     MessagesPlaceholder(variable_name="messages"),
 ])
 
+async def _shadow_check(messages: list, guess: str):
+    """Re-runs a pre-routed turn through the LLM in the background to measure agreement"""
+    try:
+        chain = supervisor_prompt | LLMFactory.get_agent_llm("supervisor", SupervisorRouterResponse)
+        decision = await chain.ainvoke({"messages": messages})
+        pre_router.record_llm_decision(guess, decision.next_agent)
+    except Exception as e:
+        logger.warning(f"Pre-router shadow check failed: {e}")
+
+
 async def supervisor_node(state: MasterState):
     """Main routing supervisor"""
-    chain = supervisor_prompt | supervisor_llm
-    
-    decision = await chain.ainvoke({
-        "messages": state["messages"]
-    })
-    
-    # Update tracking
+    messages = state["messages"]
+    guess = None
+
+    # Fast path: obvious intents on a fresh user message skip the LLM call
+    if Config.PREROUTER_ENABLED and messages and isinstance(messages[-1], HumanMessage):
+        next_agent, guess = pre_router.route(messages[-1].content)
+        if next_agent:
+            if random.random() < Config.PREROUTER_SHADOW_RATE:
+                task = asyncio.create_task(_shadow_check(prepare_messages("supervisor", state), guess))
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+            return {
+                "next_agent": next_agent,
+                "current_agent": "supervisor",
+                "fanout": None,
+                "context": {
+                    **state.get("context", {}),
+                }
+            }
+
+    user_text = _last_user_text(state)
+    # the history the supervisor sees besides the message itself
+    scope = cache_scope("supervisor", state, prepare_messages("supervisor", state, record_stats=False)[:-1])
+    decision = await response_cache.aget("supervisor", user_text, SupervisorRouterResponse, scope) if user_text else None
+
+    if decision is None:
+        # start the likely agent now, it is kept if the LLM agrees
+        speculator.start(state, speculator.predict(state, guess))
+        chain = supervisor_prompt | LLMFactory.get_agent_llm("supervisor", SupervisorRouterResponse)
+        
+        try:
+            decision = await chain.ainvoke({
+                "messages": prepare_messages("supervisor", state)
+            })
+        except BaseException:
+            # no decision, including cancellation of the turn: the speculative run is wasted
+            speculator.resolve(state.get("run_id"), [])
+            raise
+        pre_router.record_llm_decision(guess, decision.next_agent)
+
+        if user_text:
+            await response_cache.aset("supervisor", user_text, decision, scope)
+    
+    fanout = plan_fanout(decision.next_agent, decision.parallel_agents)
+    speculator.resolve(state.get("run_id"), fanout or [decision.next_agent])
+    
+    # Update tracking, independent agents of a multi-intent request run in parallel
     return {
         "next_agent": decision.next_agent,
         "current_agent": "supervisor",
+        "fanout": fanout,
         "context": {
             **state.get("context", {}),
         }
@@ -60,17 +132,123 @@ async def supervisor_node(state: MasterState):
 # EMAIL AGENT NODE
 # ============================================================================
 
-email_llm = LLMFactory.create_client(
-    provider=LLMProvider.OPENROUTER,
-    model_name="mistralai/devstral-2512:free",
-).with_structured_output(EmailAgentResponse)
-
 email_prompt = ChatPromptTemplate.from_messages([
     ("system", EMAIL_AGENT_PROMPT),
     ("system", "Current context: {context}"),
     MessagesPlaceholder(variable_name="messages"),
 ])
 
+email_batch_prompt = ChatPromptTemplate.from_messages([
+    ("system", EMAIL_AGENT_PROMPT),
+    ("system", EMAIL_BATCH_PROMPT),
+    ("system", "Current context: {context}"),
+    ("human", "{emails}"),
+])
+
+PRIORITY_ORDER = ["low", "medium", "high", "urgent"]
+
+
+def _render_email(email_obj: dict) -> str:
+    return (
+        f"Email ID: {email_obj.get('id')}\n"
+        f"From: {email_obj.get('sender')}\n"
+        f"Subject: {email_obj.get('subject')}\n\n"
+        f"{email_obj.get('body', '')}"
+    )
+
+
+def _pack_emails(emails: list) -> list:
+    """Group emails into batches that fit EMAIL_BATCH_TOKEN_BUDGET and EMAIL_BATCH_MAX_EMAILS"""
+    batches, current, used = [], [], 0
+    for email_obj in emails:
+        tokens = count_tokens([HumanMessage(content=_render_email(email_obj))])
+        if current and (used + tokens > Config.EMAIL_BATCH_TOKEN_BUDGET or len(current) >= Config.EMAIL_BATCH_MAX_EMAILS):
+            batches.append(current)
+            current, used = [], 0
+        current.append(email_obj)
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def _decide_batch(state: MasterState, batch: list) -> list:
+    """One LLM call for a batch of emails, keeping only decisions that match an email of the batch"""
+    chain = email_batch_prompt | LLMFactory.get_agent_llm("email_agent", EmailBatchResponse)
+    
+    response = await chain.ainvoke({
+        "context": f"User ID: {state.get('user_id')}",
+        "emails": "\n\n---\n\n".join(_render_email(e) for e in batch)
+    })
+    
+    ids = {e.get("id") for e in batch}
+    return [d for d in response.decisions if d.email_id in ids]
+
+
+async def _analyze_polled_emails(state: MasterState, email_data: dict, emails: list):
+    """Analyze polled emails in batches and turn each decision into per-email actions"""
+    
+    context = state.get("context", {})
+    
+    results = await asyncio.gather(*(_decide_batch(state, batch) for batch in _pack_emails(emails)))
+    decisions = {d.email_id: d for batch_decisions in results for d in batch_decisions}
+    
+    # one more attempt for emails the model left out, packed like the first pass
+    missing = [e for e in emails if e.get("id") not in decisions]
+    if missing:
+        retries = await asyncio.gather(*(_decide_batch(state, batch) for batch in _pack_emails(missing)))
+        for d in (d for batch_decisions in retries for d in batch_decisions):
+            decisions.setdefault(d.email_id, d)
+    
+    new_pending_actions = []
+    drafted_replies = []
+    verdicts = []
+    summary = []
+    
+    for email_obj in emails:
+        decision = decisions.get(email_obj.get("id"))
+        if decision is None:
+            summary.append(f"{email_obj.get('subject')}: not analyzed")
+            continue
+        
+        verdicts.append((email_obj.get("sender", ""), decision.action == "ignore" or decision.is_spam))
+        
+        if decision.action == "reply" and decision.draft_reply:
+            drafted_replies.append({"email_id": decision.email_id, "draft": decision.draft_reply})
+        
+        if decision.requires_scheduling and decision.calendar_event:
+            new_pending_actions.append({
+                "type": "schedule",
+                "data": decision.calendar_event,
+                "source": "email",
+                "email_id": decision.email_id
+            })
+        
+        summary.append(f"{email_obj.get('subject')}: {decision.action} ({decision.priority})")
+    
+    # verdicts train the sender reputation used by triage
+    email_triage.record_verdicts(state.get("user_id"), verdicts)
+    
+    priorities = [d.priority for d in decisions.values()] or ["low"]
+    
+    return {
+        "next_agent": "scheduler_agent" if new_pending_actions else "END",
+        "current_agent": "email_agent",
+        "email_data": {
+            **email_data,
+            "drafted_replies": [*email_data.get("drafted_replies", []), *drafted_replies],
+            "decisions": {email_id: d.model_dump() for email_id, d in decisions.items()}
+        },
+        "pending_actions": new_pending_actions,
+        "messages": [AIMessage(content="Emails processed. " + "; ".join(summary))],
+        "context": {
+            **context,
+            "last_email_action": "batch",
+            "email_priority": max(priorities, key=PRIORITY_ORDER.index)
+        }
+    }
+
+
 async def email_agent_node(state: MasterState):
     """Handles all email-related tasks"""
     
@@ -78,6 +256,25 @@ async def email_agent_node(state: MasterState):
     context = state.get("context", {})
     email_data = state.get("email_data", {})
     
+    # Drop obvious newsletters and spam before paying for an LLM call
+    polled_emails = email_data.get("unprocessed_emails") or []
+    if polled_emails:
+        kept, ignored = await email_triage.filter(state.get("user_id"), polled_emails)
+        email_data = {
+            **email_data,
+            "unprocessed_emails": kept,
+            "triaged_emails": [*email_data.get("triaged_emails", []), *ignored]
+        }
+        if not kept:
+            return {
+                "next_agent": "END",
+                "current_agent": "email_agent",
+                "email_data": email_data,
+                "messages": [AIMessage(content=f"Email processed. Action: ignore. {len(ignored)} filtered by triage.")],
+                "context": {**context, "last_email_action": "ignore", "email_priority": "low"}
+            }
+        return await _analyze_polled_emails(state, email_data, kept)
+    
     # Build context for LLM
     email_context = f"""
     User ID: {state.get('user_id')}
@@ -85,11 +282,11 @@ async def email_agent_node(state: MasterState):
     Email Data: {email_data}
     """
     
-    chain = email_prompt | email_llm
+    chain = email_prompt | LLMFactory.get_agent_llm("email_agent", EmailAgentResponse)
     
     response = await chain.ainvoke({
         "context": email_context,
-        "messages": state["messages"]
+        "messages": prepare_messages("email_agent", state)
     })
     
     # Perform actions based on response
@@ -151,11 +348,6 @@ async def email_agent_node(state: MasterState):
 # SCHEDULER AGENT NODE
 # ============================================================================
 
-scheduler_llm = LLMFactory.create_client(
-    provider=LLMProvider.OPENROUTER,
-    model_name="mistralai/devstral-2512:free",
-).with_structured_output(SchedulerAgentResponse)
-
 scheduler_prompt = ChatPromptTemplate.from_messages([
     ("system", SCHEDULER_AGENT_PROMPT),
     ("system", "Current calendar context: {context}"),
@@ -183,11 +375,11 @@ async def scheduler_agent_node(state: MasterState):
     Conflicts: {scheduler_data.get('conflicts', [])}
     """
     
-    chain = scheduler_prompt | scheduler_llm
+    chain = scheduler_prompt | LLMFactory.get_agent_llm("scheduler_agent", SchedulerAgentResponse)
     
     response = await chain.ainvoke({
         "context": calendar_context,
-        "messages": state["messages"]
+        "messages": prepare_messages("scheduler_agent", state)
     })
     
     # Perform calendar operations
@@ -227,11 +419,8 @@ async def scheduler_agent_node(state: MasterState):
         events = scheduler_data.get("calendar_events", [])
         response_message = f"Your upcoming events: {events}"
     
-    # Clear processed pending actions
-    remaining_actions = [
-        action for action in pending_actions 
-        if action.get("type") != "schedule"
-    ]
+    # Clear processed pending actions, leaving any a parallel branch adds in this step
+    resolved_actions = ResolvedActions(schedule_requests)
     
     next_agent = response.next_agent
     if response.requires_human_decision:
@@ -241,7 +430,7 @@ async def scheduler_agent_node(state: MasterState):
         "next_agent": next_agent,
         "current_agent": "scheduler_agent",
         "scheduler_data": {**scheduler_data, **scheduler_updates},
-        "pending_actions": remaining_actions,
+        "pending_actions": resolved_actions,
         "messages": [AIMessage(content=response_message)],
         "context": {
             **context,
@@ -256,11 +445,6 @@ async def scheduler_agent_node(state: MasterState):
 # BOOKING AGENT NODE
 # ============================================================================
 
-booking_llm = LLMFactory.create_client(
-    provider=LLMProvider.OPENROUTER,
-    model_name="mistralai/devstral-2512:free",  # Use better model for complex booking
-).with_structured_output(BookingAgentResponse)
-
 booking_prompt = ChatPromptTemplate.from_messages([
     ("system", BOOKING_AGENT_PROMPT),
     ("system", "Booking context: {context}"),
@@ -279,11 +463,11 @@ async def booking_agent_node(state: MasterState):
     User Preferences: {context.get('user_preferences', {})}
     """
     
-    chain = booking_prompt | booking_llm
+    chain = booking_prompt | LLMFactory.get_agent_llm("booking_agent", BookingAgentResponse)
     
     response = await chain.ainvoke({
         "context": booking_context,
-        "messages": state["messages"]
+        "messages": prepare_messages("booking_agent", state)
     })
     
     booking_updates = {
@@ -337,11 +521,6 @@ async def booking_agent_node(state: MasterState):
 # CHITCHAT AGENT NODE
 # ============================================================================
 
-chitchat_llm = LLMFactory.create_client(
-    provider=LLMProvider.OPENROUTER,
-    model_name="mistralai/devstral-2512:free",  # Use lite model for cost savings
-).with_structured_output(ChitChatResponse)
-
 chitchat_prompt = ChatPromptTemplate.from_messages([
     ("system", CHITCHAT_AGENT_PROMPT),
     MessagesPlaceholder(variable_name="messages"),
@@ -350,11 +529,19 @@ chitchat_prompt = ChatPromptTemplate.from_messages([
 async def chitchat_agent_node(state: MasterState):
     """Handles casual conversation"""
     
-    chain = chitchat_prompt | chitchat_llm
-    
-    response = await chain.ainvoke({
-        "messages": state["messages"]
-    })
+    user_text = _last_user_text(state)
+    scope = cache_scope("chitchat_agent", state)
+    response = await response_cache.aget("chitchat_agent", user_text, ChitChatResponse, scope) if user_text else None
+
+    if response is None:
+        chain = chitchat_prompt | LLMFactory.get_agent_llm("chitchat_agent", ChitChatResponse)
+        
+        response = await chain.ainvoke({
+            "messages": prepare_messages("chitchat_agent", state)
+        })
+
+        if user_text:
+            await response_cache.aset("chitchat_agent", user_text, response, scope)
     
     next_agent = response.next_agent
     
@@ -378,11 +565,6 @@ async def chitchat_agent_node(state: MasterState):
 # HEALTH MONITOR NODE
 # ============================================================================
 
-health_llm = LLMFactory.create_client(
-    provider=LLMProvider.OPENROUTER,
-    model_name="mistralai/devstral-2512:free",
-).with_structured_output(HealthMonitorResponse)
-
 health_prompt = ChatPromptTemplate.from_messages([
     ("system", HEALTH_MONITOR_PROMPT),
     ("system", "Interaction history: {history}"),
@@ -400,11 +582,11 @@ async def health_monitor_node(state: MasterState):
         for h in interaction_history[-10:]  # Last 10 interactions
     ])
     
-    chain = health_prompt | health_llm
+    chain = health_prompt | LLMFactory.get_agent_llm("health_monitor", HealthMonitorResponse)
     
     response = await chain.ainvoke({
         "history": history_summary,
-        "messages": state["messages"]
+        "messages": prepare_messages("health_monitor", state)
     })
     
     # Update emotion state
@@ -446,8 +628,14 @@ async def human_review_node(state: MasterState):
     
     context = state.get("context", {})
     
-    # This node typically waits for user input
-    # In practice, this would pause the graph and wait for user action
+    # With a checkpointer the graph pauses before this node and resumes
+    # once PersonalAssistant.provide_feedback has set human_feedback
+    if state.get("human_feedback"):
+        return {
+            "current_agent": "human_review",
+            "next_agent": "supervisor",
+            "requires_human": False
+        }
     
     return {
         "current_agent": "human_review",
@@ -455,4 +643,16 @@ async def human_review_node(state: MasterState):
         "messages": [
             SystemMessage(content="⏸️ Waiting for your confirmation...")
         ]
-    }
\ No newline at end of file
+    }
+
+
+# ============================================================================
+# FAN-OUT JOIN NODE
+# ============================================================================
+
+async def join_node(state: MasterState):
+    """Runs once every parallel branch of a fan-out is done, their updates are already merged"""
+    return {
+        "fanout": None,
+        "next_agent": "END"
+    }
@@ -14,8 +14,7 @@ supervisor_prompt = ChatPromptTemplate.from_messages([
     ])
 
 async def supervisor_node(state: MasterState):
-    llm_client = LLMFactory.get_client_for_agent("supervisor")
-    supervisor_llm = llm_client.with_structured_output(SupervisorRouterResponse)
+    supervisor_llm = LLMFactory.get_agent_llm("supervisor", SupervisorRouterResponse)
     
     chain = supervisor_prompt | supervisor_llm
     
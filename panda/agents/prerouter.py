@@ -0,0 +1,194 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+from panda import Config
+
+
+# ============================================================================
+# RULES
+# ============================================================================
+
+def _pair(actions: str, objects: str) -> re.Pattern:
+    """An action followed by its object within a few words, e.g. 'book a flight'"""
+    return re.compile(rf"\b({actions})\b(\W+\w+){{0,4}}?\W+({objects})\b")
+
+
+EMAIL_OBJECTS = r"e-?mails?|inbox|gmail|unread|mails?|messages?|response"
+SCHEDULE_OBJECTS = r"meetings?|calendar|appointments?|agenda|reminders?|events?|todo|to-do"
+BOOKING_OBJECTS = r"flights?|hotels?|tables?|tickets?|trains?|rooms?|seats?"
+
+# (agent, pattern, weight) - weights are summed per agent.
+# Single keywords are ambiguous ("I look forward to it", "I read a great book"), so only an
+# action paired with its object reaches PREROUTER_MIN_CONFIDENCE, a keyword alone stays below.
+INTENT_RULES: List[Tuple[str, re.Pattern, float]] = [
+    ("email_agent", _pair(r"check|read|send|draft|write|reply|respond|forward|answer|show|open|archive|delete|any", EMAIL_OBJECTS), 0.9),
+    ("email_agent", re.compile(r"^(reply|respond|write back) to\b"), 0.9),
+    ("email_agent", re.compile(r"\b(e-?mails?|inbox|gmail|unread)\b"), 0.3),
+    ("scheduler_agent", _pair(r"schedule|reschedule|move|cancel|add|set|create|put|plan|what's on|show|check", SCHEDULE_OBJECTS), 0.9),
+    ("scheduler_agent", re.compile(r"\bremind me\b"), 0.9),
+    ("scheduler_agent", re.compile(rf"\b({SCHEDULE_OBJECTS}|schedul\w*)\b"), 0.3),
+    ("scheduler_agent", re.compile(r"\b(deadline|tomorrow at|next week at)\b"), 0.3),
+    ("booking_agent", _pair(r"book|reserve|buy|order|find|search|get me|looking for", BOOKING_OBJECTS), 0.9),
+    ("booking_agent", re.compile(rf"\b({BOOKING_OBJECTS}|book|booking|reserv\w*)\b"), 0.3),
+]
+
+GREETING_PATTERN = re.compile(
+    r"^(hi|hey|hello|hiya|yo|sup|good (morning|afternoon|evening)|thanks|thank you|how are you|"
+    r"how's it going|what's up)\b"
+)
+
+# greetings longer than this are usually a greeting followed by a real request
+MAX_GREETING_WORDS = 8
+
+
+class PreRouter:
+    """
+    Keyword based router that answers obvious intents in-process,
+    so the supervisor LLM only runs for ambiguous messages.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.hits = 0
+        self.fallbacks = 0
+        self.agreements = 0
+        self.disagreements = 0
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """
+        Returns the best guess agent label and a confidence in [0, 1].
+        """
+        normalized = " ".join(text.lower().split())
+        if not normalized:
+            return None, 0.0
+
+        scores: Dict[str, float] = {}
+        for agent, pattern, weight in INTENT_RULES:
+            if pattern.search(normalized):
+                scores[agent] = scores.get(agent, 0.0) + weight
+
+        if not scores:
+            if GREETING_PATTERN.match(normalized) and len(normalized.split()) <= MAX_GREETING_WORDS:
+                return "chitchat_agent", 0.9
+            return None, 0.0
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        best_agent, best_score = ranked[0]
+        confidence = min(best_score, 1.0)
+
+        # competing intents (e.g. "check my emails and schedule the meeting") are left to the LLM
+        if len(ranked) > 1:
+            confidence *= 0.5
+
+        return best_agent, confidence
+
+    def route(self, text: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Returns (agent, guess): agent is set when the prediction is confident enough to skip
+        the LLM, guess is the raw prediction kept for agreement tracking on fallback.
+        """
+        self.calls += 1
+        guess, confidence = self.predict(text)
+
+        if guess and confidence >= Config.PREROUTER_MIN_CONFIDENCE:
+            self.hits += 1
+            return guess, guess
+
+        self.fallbacks += 1
+        return None, guess
+
+    def record_llm_decision(self, guess: Optional[str], llm_agent: Optional[str]):
+        """Track whether the pre-router's guess matched what the LLM picked."""
+        if guess is None:
+            return
+        if guess == llm_agent:
+            self.agreements += 1
+        else:
+            self.disagreements += 1
+
+    def stats(self) -> Dict[str, float]:
+        compared = self.agreements + self.disagreements
+        return {
+            "calls": self.calls,
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+            "hit_rate": self.hits / self.calls if self.calls else 0.0,
+            "agreements": self.agreements,
+            "disagreements": self.disagreements,
+            "agreement_rate": self.agreements / compared if compared else 0.0,
+        }
+
+
+# Global instance
+pre_router = PreRouter()
+
+
+# ============================================================================
+# OFFLINE EVALUATION
+# ============================================================================
+
+LABELLED_UTTERANCES: List[Tuple[str, str]] = [
+    ("Hey, how are you doing today?", "chitchat_agent"),
+    ("hi", "chitchat_agent"),
+    ("Good morning!", "chitchat_agent"),
+    ("thanks a lot", "chitchat_agent"),
+    ("what's up", "chitchat_agent"),
+    ("Tell me a joke", "chitchat_agent"),
+    ("What is the capital of France?", "chitchat_agent"),
+    ("Check my emails and let me know if there's anything important", "email_agent"),
+    ("any unread mail in my inbox?", "email_agent"),
+    ("Reply to John and say I'll be late", "email_agent"),
+    ("Draft a response to the landlord's message", "email_agent"),
+    ("forward the invoice email to accounting", "email_agent"),
+    ("Schedule a meeting with the team for tomorrow at 2pm", "scheduler_agent"),
+    ("remind me to call mom at 6", "scheduler_agent"),
+    ("what's on my calendar this week", "scheduler_agent"),
+    ("add 'renew passport' to my todo list", "scheduler_agent"),
+    ("move my dentist appointment to friday", "scheduler_agent"),
+    ("I need to book a flight to San Francisco for next week", "booking_agent"),
+    ("find hotels in Lisbon for the weekend", "booking_agent"),
+    ("reserve a table for two at 8", "booking_agent"),
+    ("get me train tickets to Berlin", "booking_agent"),
+    ("Check my emails for any meeting requests and add them to my calendar", "email_agent"),
+    ("hey, can you book a hotel near the conference?", "booking_agent"),
+    # single keywords that are not a request for the agent
+    ("I look forward to it", "chitchat_agent"),
+    ("I read a great book yesterday", "chitchat_agent"),
+    ("my support tickets are piling up", "chitchat_agent"),
+    ("she trains dogs", "chitchat_agent"),
+    ("I enjoyed meeting you", "chitchat_agent"),
+]
+
+
+def evaluate(corpus: List[Tuple[str, str]] = LABELLED_UTTERANCES) -> Dict[str, float]:
+    """
+    Replays a labelled corpus through the rules.
+    Coverage is the share answered without the LLM, accuracy is measured on that share.
+    """
+    router = PreRouter()
+    correct = 0
+    mistakes = []
+
+    for text, label in corpus:
+        agent, _ = router.route(text)
+        if agent is None:
+            continue
+        if agent == label:
+            correct += 1
+        else:
+            mistakes.append((text, label, agent))
+
+    return {
+        "utterances": len(corpus),
+        "coverage": router.hits / len(corpus) if corpus else 0.0,
+        "accuracy": correct / router.hits if router.hits else 0.0,
+        "mistakes": mistakes,
+    }
+
+
+if __name__ == '__main__':
+    report = evaluate()
+    print(f"coverage: {report['coverage']:.0%} of {report['utterances']} utterances")
+    print(f"accuracy on covered: {report['accuracy']:.0%}")
+    for text, label, agent in report["mistakes"]:
+        print(f"  '{text}': expected {label}, got {agent}")
@@ -0,0 +1,69 @@
+import time
+import logging
+from typing import Any, Callable, Dict, Tuple
+
+from panda import Config
+from panda.agents.graph import create_agent_graph, create_polling_graph
+from panda.core.llm.config_manager import config_manager
+from panda.database.mongo.checkpointer import mongo_checkpointer
+
+logger = logging.getLogger(__name__)
+
+GRAPH_BUILDERS: Dict[str, Callable[[], Any]] = {
+    "agent": lambda: create_agent_graph(
+        checkpointer=mongo_checkpointer if Config.CHECKPOINTS_ENABLED else None
+    ),
+    "polling": create_polling_graph,
+}
+
+
+class GraphRegistry:
+    """
+    Process-wide cache of compiled graphs.
+    Graphs are keyed by (kind, config version) and only rebuilt when the agent config changes.
+    """
+
+    def __init__(self, builders: Dict[str, Callable[[], Any]]):
+        self._builders = builders
+        self._graphs: Dict[Tuple[str, int], Any] = {}
+        self._build_log: Dict[str, Dict[str, Any]] = {}
+
+    def build_all(self):
+        """Compile every registered graph for the current config version."""
+        for kind in self._builders:
+            self._build(kind, config_manager.version)
+
+    def get(self, kind: str):
+        """Return the compiled graph of the given kind, building it if stale or missing."""
+        if kind not in self._builders:
+            raise ValueError(f"Unknown graph kind: {kind}")
+
+        graph = self._graphs.get((kind, config_manager.version))
+        if graph is None:
+            graph = self._build(kind, config_manager.version)
+        return graph
+
+    def _build(self, kind: str, version: int):
+        start = time.perf_counter()
+        graph = self._builders[kind]()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        # drop graphs compiled for older config versions
+        for key in [k for k in self._graphs if k[0] == kind and k[1] != version]:
+            del self._graphs[key]
+        self._graphs[(kind, version)] = graph
+
+        log = self._build_log.setdefault(kind, {"builds": 0, "total_ms": 0.0})
+        log["builds"] += 1
+        log["total_ms"] += elapsed_ms
+        log["last_ms"] = elapsed_ms
+        log["config_version"] = version
+        logger.info(f"Compiled '{kind}' graph for config v{version} in {elapsed_ms:.1f}ms")
+        return graph
+
+    def stats(self) -> Dict[str, Any]:
+        return {kind: dict(log) for kind, log in self._build_log.items()}
+
+
+# Global instance
+graph_registry = GraphRegistry(GRAPH_BUILDERS)
@@ -0,0 +1,179 @@
+import time
+import asyncio
+import logging
+import contextvars
+from functools import wraps
+from typing import Callable, Dict, Iterable, Optional
+
+from langchain_core.runnables.config import var_child_runnable_config
+from langgraph.config import get_config
+
+from panda import Config
+from panda.models.agents.state import MasterState
+from panda.agents.history import prepare_messages
+from panda.utils.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Unclaimed speculative runs are dropped after this many seconds
+STALE_AFTER = 120.0
+
+# Nodes that are never a speculation target
+NON_AGENT_NODES = {"supervisor", "join", "human_review"}
+
+
+def _turn_context() -> contextvars.Context:
+    """
+    Fresh context for a speculative run carrying only the turn's configurable values.
+    The call must not report itself as part of the supervisor's run, but the rate limiter
+    still needs the turn's user_id.
+    """
+    context = contextvars.Context()
+    try:
+        configurable = get_config().get("configurable", {})
+    except RuntimeError:
+        return context  # outside a graph run
+    # LangGraph's internal keys belong to the supervisor's task
+    configurable = {key: value for key, value in configurable.items() if not key.startswith("__")}
+    context.run(var_child_runnable_config.set, {"configurable": configurable})
+    return context
+
+
+class Speculator:
+    """
+    Starts the most likely next agent while the supervisor LLM is still deciding.
+
+    The guess comes from the pre-router, or the agent that handled the previous turn.
+    When the supervisor picks the same agent, its node reuses the running call instead
+    of starting a new one; otherwise the call is cancelled and its estimated tokens
+    count as wasted. Only agents listed in SPECULATIVE_AGENTS are started, so they
+    must be free of side effects, and wasted tokens are capped per hour.
+    """
+
+    def __init__(self):
+        self.enabled_agents = {
+            agent.strip() for agent in Config.SPECULATIVE_AGENTS.split(",") if agent.strip()
+        }
+        self._nodes: Dict[str, Callable] = {}
+        # run_id -> {"agent", "task", "tokens", "started", "hit"}
+        self._runs: Dict[str, dict] = {}
+        self._window_start = time.monotonic()
+        self._window_waste = 0
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.over_budget = 0
+        self.wasted_tokens = 0
+
+    def register(self, name: str, node: Callable):
+        self._nodes[name] = node
+
+    def _previous_agent(self, state: MasterState) -> Optional[str]:
+        run_id = state.get("run_id")
+        for entry in reversed(state.get("route_trace", [])):
+            if entry.get("run_id") != run_id and entry["node"] not in NON_AGENT_NODES and not entry.get("skipped"):
+                return entry["node"]
+        return None
+
+    def predict(self, state: MasterState, guess: Optional[str]) -> Optional[str]:
+        """Agent worth starting early for this turn, if any"""
+        agent = guess or self._previous_agent(state)
+        if agent in self.enabled_agents and agent in self._nodes:
+            return agent
+        return None
+
+    def _budget_left(self) -> bool:
+        if time.monotonic() - self._window_start >= 3600:
+            self._window_start = time.monotonic()
+            self._window_waste = 0
+        return self._window_waste < Config.SPECULATION_WASTE_BUDGET
+
+    def start(self, state: MasterState, agent: Optional[str]):
+        """Run agent's node in the background for this run"""
+        run_id = state.get("run_id")
+        if not Config.SPECULATION_ENABLED or agent is None or run_id in self._runs:
+            return
+        if not self._budget_left():
+            self.over_budget += 1
+            return
+
+        now = time.monotonic()
+        for stale_id in [r for r, run in self._runs.items() if now - run["started"] > STALE_AFTER]:
+            self._runs.pop(stale_id)["task"].cancel()
+
+        task = asyncio.get_running_loop().create_task(self._nodes[agent](state), context=_turn_context())
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._runs[run_id] = {
+            "agent": agent,
+            "task": task,
+            "tokens": count_tokens(prepare_messages(agent, state, record_stats=False)),
+            "started": now,
+            "hit": False,
+        }
+        self.started += 1
+
+    def resolve(self, run_id: str, chosen: Iterable[Optional[str]]):
+        """Keep the speculative run if the supervisor chose its agent, cancel it otherwise"""
+        run = self._runs.get(run_id)
+        if run is None:
+            return
+
+        if run["agent"] in set(chosen):
+            run["hit"] = True
+            self.hits += 1
+            return
+
+        self._runs.pop(run_id)
+        task = run["task"]
+        wasted = run["tokens"]
+        if task.done() and not task.cancelled() and task.exception() is None:
+            wasted += count_tokens(task.result().get("messages", []))
+        task.cancel()
+        self.misses += 1
+        self.wasted_tokens += wasted
+        self._window_waste += wasted
+
+    async def claim(self, run_id: str, agent: str) -> Optional[dict]:
+        """Result of the agreed speculative run for agent, None if there is none or it failed"""
+        run = self._runs.get(run_id)
+        if run is None or not run["hit"] or run["agent"] != agent:
+            return None
+
+        self._runs.pop(run_id)
+        try:
+            return await run["task"]
+        except Exception as e:
+            logger.warning(f"Speculative {agent} run failed, running it again: {e}")
+            return None
+
+    def stats(self) -> Dict[str, float]:
+        decided = self.hits + self.misses
+        return {
+            "enabled": Config.SPECULATION_ENABLED,
+            "agents": sorted(self.enabled_agents),
+            "started": self.started,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / decided if decided else 0.0,
+            "wasted_tokens": self.wasted_tokens,
+            "over_budget": self.over_budget,
+            "in_flight": len(self._runs),
+        }
+
+
+# Global instance
+speculator = Speculator()
+
+
+def speculative(name: str, node: Callable) -> Callable:
+    """Wrap an agent node so it reuses the speculative run started for it, if any"""
+    speculator.register(name, node)
+
+    @wraps(node)
+    async def run(state: MasterState):
+        update = await speculator.claim(state.get("run_id"), name)
+        if update is None:
+            update = await node(state)
+        return update
+
+    return run
@@ -0,0 +1,300 @@
+import re
+import math
+import random
+import asyncio
+import logging
+from datetime import datetime
+from email.utils import parseaddr
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from panda import Config
+from panda.database.mongo.connection import mongo, COLLECTIONS
+from panda.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# FEATURES
+# ============================================================================
+
+NOREPLY_PATTERN = re.compile(r"^(no-?reply|do-?not-?reply|notifications?|mailer-daemon|newsletter|marketing|bounce)[^@]*@")
+BULK_PRECEDENCE = {"bulk", "list", "junk"}
+
+# (feature, pattern, weight) matched against subject + body
+CONTENT_RULES: List[Tuple[str, re.Pattern, float]] = [
+    ("unsubscribe_text", re.compile(r"\bunsubscribe\b|manage (your )?(email )?preferences"), 2.0),
+    ("view_in_browser", re.compile(r"view (this email )?(it )?in (your |a )?browser"), 1.5),
+    ("discount", re.compile(r"\b\d{1,2}% off\b|\bsale ends\b|\bfree shipping\b|\bpromo code\b"), 2.0),
+    ("urgency", re.compile(r"\blimited time\b|\bact now\b|\blast chance\b|\bexclusive offer\b"), 1.5),
+    ("scam", re.compile(r"\byou('ve| have) won\b|\bclaim your (prize|reward)\b|\bwire transfer\b|\bcrypto giveaway\b"), 6.0),
+    ("personal_request", re.compile(r"\b(can|could|would) you\b|\bplease (reply|confirm|let me know)\b|\bmeeting\b|\binterview\b|\binvoice\b|\bdeadline\b"), -2.5),
+]
+
+# (feature, weight) for header signals
+HEADER_WEIGHTS: Dict[str, float] = {
+    "list_unsubscribe": 2.0,
+    "bulk_precedence": 2.0,
+    "auto_submitted": 1.5,
+    "list_id": 1.5,
+    "noreply_sender": 2.0,
+}
+
+# logistic bias, an email without any signal scores ~0.05
+BIAS = -3.0
+
+# share of LLM verdicts that were 'ignore' for a sender, centered on 0.5, times this weight
+REPUTATION_WEIGHT = 6.0
+MIN_REPUTATION_SAMPLES = 3
+
+DEFAULT_SETTINGS = {
+    "enabled": True,
+    "threshold": Config.TRIAGE_THRESHOLD,
+    "allow_senders": [],
+    "block_senders": [],
+}
+
+
+def sender_address(sender: str) -> str:
+    return parseaddr(sender or "")[1].lower()
+
+
+def extract_features(email_obj: dict) -> Dict[str, float]:
+    """Binary header and content features of an email, keyed by name."""
+    headers = email_obj.get("headers", {})
+    features: Dict[str, float] = {}
+
+    if headers.get("list-unsubscribe"):
+        features["list_unsubscribe"] = 1.0
+    if headers.get("precedence", "").strip().lower() in BULK_PRECEDENCE:
+        features["bulk_precedence"] = 1.0
+    if headers.get("auto-submitted", "no").strip().lower() != "no":
+        features["auto_submitted"] = 1.0
+    if headers.get("list-id"):
+        features["list_id"] = 1.0
+    if NOREPLY_PATTERN.match(sender_address(email_obj.get("sender", ""))):
+        features["noreply_sender"] = 1.0
+
+    text = f"{email_obj.get('subject', '')} {email_obj.get('body', '')}".lower()
+    for name, pattern, _ in CONTENT_RULES:
+        if pattern.search(text):
+            features[name] = 1.0
+
+    return features
+
+
+WEIGHTS: Dict[str, float] = {**HEADER_WEIGHTS, **{name: weight for name, _, weight in CONTENT_RULES}}
+
+
+def score(features: Dict[str, float], ignore_rate: Optional[float] = None) -> float:
+    """Probability that the email can be ignored, from a small logistic model."""
+    z = BIAS + sum(WEIGHTS.get(name, 0.0) * value for name, value in features.items())
+    if ignore_rate is not None:
+        z += REPUTATION_WEIGHT * (ignore_rate - 0.5) * 2
+    return 1 / (1 + math.exp(-z))
+
+
+# ============================================================================
+# TRIAGE
+# ============================================================================
+
+class EmailTriage:
+    """
+    In-process pre-filter for polled emails.
+    Obvious newsletters and spam are marked 'ignore' without an email agent LLM call,
+    everything else goes to the LLM whose verdicts feed the sender reputation table.
+    Ignored mail gets no verdict, so TRIAGE_EXPLORE_RATE of the emails ignored on a
+    sender's reputation still go to the LLM and the reputation can recover.
+    """
+
+    def __init__(self):
+        self._settings = LRUCache(max_size=1024, ttl=60)
+        self.emails_seen = 0
+        self.emails_ignored = 0
+        self.llm_calls_avoided = 0
+        self.emails_explored = 0
+        self.reputation_updates = 0
+        # reputation writes in flight, the loop only keeps weak references to tasks
+        self._tasks = set()
+
+    async def get_settings(self, user_id: str) -> dict:
+        """Per-user triage settings from the users collection, cached briefly."""
+        settings = self._settings.get(user_id)
+        if settings is None:
+            user = await mongo.db[COLLECTIONS['users']].find_one(
+                {"username": user_id}, {"triage_settings": 1}
+            ) if mongo.db is not None else None
+            settings = {**DEFAULT_SETTINGS, **((user or {}).get("triage_settings") or {})}
+            self._settings.set(user_id, settings)
+        return settings
+
+    async def update_settings(self, user_id: str, settings: dict) -> dict:
+        await mongo.db[COLLECTIONS['users']].update_one(
+            {"username": user_id},
+            {"$set": {"triage_settings": settings}},
+            upsert=True
+        )
+        self._settings.pop(user_id)
+        return await self.get_settings(user_id)
+
+    async def _ignore_rates(self, user_id: str, senders: List[str]) -> Dict[str, float]:
+        if mongo.db is None or not senders:
+            return {}
+        cursor = mongo.db[COLLECTIONS['sender_reputation']].find(
+            {"user_id": user_id, "sender": {"$in": senders}}
+        )
+        rates = {}
+        async for doc in cursor:
+            total = doc.get("ignored", 0) + doc.get("engaged", 0)
+            if total >= MIN_REPUTATION_SAMPLES:
+                rates[doc["sender"]] = doc.get("ignored", 0) / total
+        return rates
+
+    async def filter(self, user_id: str, emails: List[dict]) -> Tuple[List[dict], List[dict]]:
+        """
+        Split emails into (kept for the LLM, ignored).
+        Ignored entries are {id, sender, subject, score, reasons}.
+        """
+        settings = await self.get_settings(user_id)
+        self.emails_seen += len(emails)
+        if not Config.TRIAGE_ENABLED or not settings["enabled"] or not emails:
+            return emails, []
+
+        allow = {s.lower() for s in settings["allow_senders"]}
+        block = {s.lower() for s in settings["block_senders"]}
+        rates = await self._ignore_rates(user_id, list({sender_address(e.get("sender", "")) for e in emails}))
+
+        kept, ignored = [], []
+        for email_obj in emails:
+            address = sender_address(email_obj.get("sender", ""))
+            if address in allow:
+                kept.append(email_obj)
+                continue
+
+            features = extract_features(email_obj)
+            probability = 1.0 if address in block else score(features, rates.get(address))
+            on_reputation = address not in block and address in rates and score(features) < settings["threshold"]
+            if on_reputation and random.random() < Config.TRIAGE_EXPLORE_RATE:
+                self.emails_explored += 1
+                kept.append(email_obj)
+            elif probability >= settings["threshold"]:
+                reasons = ["blocked sender"] if address in block else sorted(features)
+                if address not in block and address in rates:
+                    reasons.append(f"sender ignored {rates[address]:.0%} of the time")
+                ignored.append({
+                    "id": email_obj.get("id"),
+                    "sender": email_obj.get("sender"),
+                    "subject": email_obj.get("subject"),
+                    "score": round(probability, 3),
+                    "reasons": reasons,
+                })
+            else:
+                kept.append(email_obj)
+
+        self.emails_ignored += len(ignored)
+        if ignored and not kept:
+            self.llm_calls_avoided += 1
+        return kept, ignored
+
+    def record_verdicts(self, user_id: str, verdicts: List[Tuple[str, bool]]):
+        """Store the LLM's (sender, ignored) verdicts in the reputation table, off the request path"""
+        verdicts = [(sender_address(sender), was_ignored) for sender, was_ignored in verdicts]
+        verdicts = [(address, was_ignored) for address, was_ignored in verdicts if address]
+        if mongo.db is None or not verdicts:
+            return
+
+        async def _update():
+            try:
+                now = datetime.utcnow()
+                await mongo.db[COLLECTIONS['sender_reputation']].bulk_write([
+                    UpdateOne(
+                        {"user_id": user_id, "sender": address},
+                        {"$inc": {"ignored" if was_ignored else "engaged": 1}, "$set": {"updated_at": now}},
+                        upsert=True
+                    )
+                    for address, was_ignored in verdicts
+                ], ordered=False)
+                self.reputation_updates += len(verdicts)
+            except Exception as e:
+                logger.error(f"Failed to update sender reputation: {e}")
+
+        task = asyncio.create_task(_update())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "emails_seen": self.emails_seen,
+            "emails_ignored": self.emails_ignored,
+            "ignore_rate": self.emails_ignored / self.emails_seen if self.emails_seen else 0.0,
+            "llm_calls_avoided": self.llm_calls_avoided,
+            "emails_explored": self.emails_explored,
+            "reputation_updates": self.reputation_updates,
+        }
+
+
+# Global instance
+email_triage = EmailTriage()
+
+
+# ============================================================================
+# OFFLINE EVALUATION
+# ============================================================================
+
+LABELLED_EMAILS: List[Tuple[dict, bool]] = [
+    ({"sender": "Shop <newsletter@shop.example.com>", "subject": "48 hours only: 30% off everything",
+      "body": "View this email in your browser. Free shipping on all orders. Unsubscribe",
+      "headers": {"list-unsubscribe": "<mailto:u@shop.example.com>", "precedence": "bulk"}}, True),
+    ({"sender": "no-reply@service.example.com", "subject": "Your weekly digest",
+      "body": "Here is what happened this week. Manage your email preferences.",
+      "headers": {"list-id": "<digest.service.example.com>"}}, True),
+    ({"sender": "Lottery <claims@prize.example.net>", "subject": "Congratulations",
+      "body": "You have won! Claim your prize by wire transfer today.", "headers": {}}, True),
+    ({"sender": "Deals <deals@travel.example.com>", "subject": "Last chance: exclusive offer",
+      "body": "Act now, limited time. Use promo code TRIP.",
+      "headers": {"list-unsubscribe": "<https://travel.example.com/u>"}}, True),
+    ({"sender": "Alice <alice@example.com>", "subject": "Meeting tomorrow",
+      "body": "Could you send me the slides before the meeting?", "headers": {}}, False),
+    ({"sender": "Bob <bob@example.org>", "subject": "Invoice #123",
+      "body": "Please confirm you received the invoice. Deadline is Friday.", "headers": {}}, False),
+    ({"sender": "Recruiter <jane@company.example>", "subject": "Interview availability",
+      "body": "Would you be available for an interview next week?",
+      "headers": {"list-unsubscribe": "<mailto:u@company.example>"}}, False),
+    ({"sender": "Mom <mom@example.com>", "subject": "Dinner",
+      "body": "Are you coming on Sunday? Dad is making lasagna.", "headers": {}}, False),
+    ({"sender": "GitHub <notifications@github.com>", "subject": "[repo] New issue opened",
+      "body": "A new issue was opened. Reply to this email directly or view it on GitHub.",
+      "headers": {"list-id": "<repo.github.com>", "precedence": "list", "list-unsubscribe": "<mailto:u@github.com>"}}, True),
+]
+
+
+def evaluate(corpus: List[Tuple[dict, bool]] = LABELLED_EMAILS, threshold: float = None) -> Dict[str, float]:
+    """
+    Replays a labelled corpus through the classifier, without reputation.
+    Coverage is the share of ignorable emails caught, false positives are emails that needed the LLM.
+    """
+    threshold = Config.TRIAGE_THRESHOLD if threshold is None else threshold
+    ignorable = sum(1 for _, label in corpus if label)
+    caught, false_positives = 0, []
+
+    for email_obj, label in corpus:
+        if score(extract_features(email_obj)) >= threshold:
+            if label:
+                caught += 1
+            else:
+                false_positives.append(email_obj["subject"])
+
+    return {
+        "emails": len(corpus),
+        "coverage": caught / ignorable if ignorable else 0.0,
+        "false_positives": false_positives,
+    }
+
+
+if __name__ == '__main__':
+    report = evaluate()
+    print(f"ignorable caught: {report['coverage']:.0%} ({report['emails']} labelled emails)")
+    for subject in report["false_positives"]:
+        print(f"  false positive: '{subject}'")
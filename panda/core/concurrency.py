@@ -0,0 +1,225 @@
+import time
+import asyncio
+import multiprocessing
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+
+from panda import Config
+from panda.models.errors import QueueFull
+from panda.models.llm import LLMProvider
+from panda.utils.text import get_url_extractor
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded wait queue.
+    Callers beyond max_queue waiters are rejected immediately with QueueFull
+    instead of piling up behind the limit.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float = None):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._wait_times = deque(maxlen=1000)
+
+    async def acquire(self):
+        """Wait for a slot, raising QueueFull if the wait queue is full or the wait times out."""
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise QueueFull(f"{self.waiting} requests already waiting")
+
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise QueueFull(f"No slot freed up within {self.queue_timeout}s")
+        finally:
+            self.waiting -= 1
+
+        self._wait_times.append(time.perf_counter() - start)
+        self.admitted += 1
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._wait_times)
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_ms_p50": waits[len(waits) // 2] * 1000 if waits else 0.0,
+            "wait_ms_p95": waits[int(len(waits) * 0.95)] * 1000 if waits else 0.0,
+            "wait_ms_max": waits[-1] * 1000 if waits else 0.0,
+        }
+
+
+class ProviderLimiter:
+    """One AdmissionController per LLM provider, bounding outbound calls to each backend."""
+
+    def __init__(self):
+        self._limiters: Dict[LLMProvider, AdmissionController] = {}
+
+    def get(self, provider: LLMProvider) -> AdmissionController:
+        limiter = self._limiters.get(provider)
+        if limiter is None:
+            limiter = AdmissionController(
+                max_concurrent=Config.LLM_PROVIDER_CONCURRENCY,
+                max_queue=Config.LLM_PROVIDER_MAX_QUEUE,
+            )
+            self._limiters[provider] = limiter
+        return limiter
+
+    def stats(self) -> Dict[str, Any]:
+        return {provider.value: limiter.stats() for provider, limiter in self._limiters.items()}
+
+
+class CpuPool:
+    """
+    Runs CPU-heavy functions in a process or thread pool so they don't block the event loop.
+    At most max_workers jobs run and max_queue wait; beyond that work runs inline
+    rather than piling up behind the pool.
+    """
+
+    def __init__(self, kind: str, max_workers: int, max_queue: int, initializer: Callable = None):
+        self.kind = kind
+        self.max_workers = max_workers
+        self.initializer = initializer
+        self._admission = AdmissionController(max_concurrent=max_workers, max_queue=max_queue)
+        self._executor: Optional[Executor] = None
+
+        self.offloaded = 0
+        self.inline = 0
+        self.overflow = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                # spawn, forking a process running an event loop and driver threads is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=self.initializer,
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="cpu-pool",
+                    initializer=self.initializer,
+                )
+        return self._executor
+
+    async def run(self, func: Callable, *args, size: int = None):
+        """
+        Run func(*args) in the pool, or inline when size is below CPU_OFFLOAD_MIN_BYTES,
+        offloading is disabled or the pool's queue is full.
+        """
+        if not Config.CPU_OFFLOAD_ENABLED or (size is not None and size < Config.CPU_OFFLOAD_MIN_BYTES):
+            self.inline += 1
+            return func(*args)
+
+        try:
+            await self._admission.acquire()
+        except QueueFull:
+            self.overflow += 1
+            return func(*args)
+
+        try:
+            self.offloaded += 1
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._admission.release()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "offloaded": self.offloaded,
+            "inline": self.inline,
+            "overflow": self.overflow,
+            "queue": self._admission.stats(),
+        }
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag as the delay of a periodic sleep past its deadline."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lags = deque(maxlen=1000)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self._lags.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def stats(self) -> Dict[str, Any]:
+        lags = sorted(self._lags)
+        return {
+            "samples": len(lags),
+            "lag_ms_p50": lags[len(lags) // 2] * 1000 if lags else 0.0,
+            "lag_ms_p95": lags[int(len(lags) * 0.95)] * 1000 if lags else 0.0,
+            "lag_ms_max": lags[-1] * 1000 if lags else 0.0,
+        }
+
+
+# Global instances
+chat_admission = AdmissionController(
+    max_concurrent=Config.CHAT_MAX_CONCURRENCY,
+    max_queue=Config.CHAT_MAX_QUEUE,
+    queue_timeout=Config.CHAT_QUEUE_TIMEOUT,
+)
+provider_limiter = ProviderLimiter()
+cpu_pool = CpuPool(
+    kind=Config.CPU_POOL_KIND,
+    max_workers=Config.CPU_POOL_WORKERS,
+    max_queue=Config.CPU_POOL_MAX_QUEUE,
+    initializer=get_url_extractor,
+)
+loop_lag = LoopLagMonitor(interval=Config.LOOP_LAG_INTERVAL)
@@ -0,0 +1,79 @@
+import logging
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import httpx
+
+from panda import Config
+from panda.models.llm import LLMProvider
+from panda.core.llm.rate_limiter import llm_rate_limits
+
+logger = logging.getLogger(__name__)
+
+
+class ClientRegistry:
+    """
+    Keeps one chat client per (provider, model_name, temperature, base_url)
+    and one keep-alive httpx.AsyncClient per (provider, base_url), so every agent turn
+    reuses warm connections instead of opening a fresh pool.
+    """
+
+    def __init__(self):
+        self._clients: Dict[Hashable, Any] = {}
+        self._http_clients: Dict[Tuple[LLMProvider, str], httpx.AsyncClient] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_http_client(self, provider: LLMProvider, base_url: Optional[str] = None, headers: Optional[dict] = None) -> httpx.AsyncClient:
+        """Return the shared async HTTP client for a provider and base URL, creating it on first use."""
+        key = (provider, base_url or "")
+        client = self._http_clients.get(key)
+        if client is None or client.is_closed:
+            limits = httpx.Limits(
+                max_connections=Config.LLM_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.LLM_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=Config.LLM_POOL_KEEPALIVE_EXPIRY,
+            )
+            client = httpx.AsyncClient(
+                base_url=base_url or "",
+                headers=headers,
+                limits=limits,
+                timeout=httpx.Timeout(Config.LLM_TIMEOUT, connect=min(10.0, Config.LLM_TIMEOUT)),
+                # rate limit headers and 429s tune the per-model limiters
+                event_hooks={"response": [llm_rate_limits.response_hook(provider)]},
+            )
+            self._http_clients[key] = client
+        return client
+
+    def get_or_create(self, key: Hashable, builder: Callable[[], Any]):
+        """Return the cached client for key or build and cache a new one."""
+        client = self._clients.get(key)
+        if client is not None:
+            self.hits += 1
+            return client
+
+        self.misses += 1
+        client = builder()
+        self._clients[key] = client
+        return client
+
+    async def aclose(self):
+        """Close every pooled HTTP client and forget the cached chat clients."""
+        for (provider, base_url), client in self._http_clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.error(f"Failed to close HTTP pool for {provider.value} {base_url}: {e}")
+        self._http_clients.clear()
+        self._clients.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "clients": len(self._clients),
+            "http_pools": [f"{provider.value} {base_url}".strip() for provider, base_url in self._http_clients],
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Global instance
+client_registry = ClientRegistry()
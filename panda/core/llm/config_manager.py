@@ -58,6 +58,8 @@ class ConfigManager:
             return
             
         self.config: Dict[str, Any] = DEFAULT_AGENTS_CONFIG.copy()
+        # bumped whenever the effective model config changes, used as a cache key
+        self.version = 0
         self._initialized = True
         self._db_collection_name = 'settings'
         self._config_doc_name = "agent_configurations"
@@ -82,8 +84,9 @@ class ConfigManager:
                 # Merge DB config into current config (to preserve defaults for missing keys if any)
                 # Or simply replace. Here we replace keys present in DB.
                 db_config = doc["config"]
-                for agent, settings in db_config.items():
-                    self.config[agent] = settings
+                if self._has_changes(db_config):
+                    self.config = {**self.config, **db_config}
+                    self.version += 1
             else:
                 logger.info("No agent configurations found in database. Using defaults.")
                 # Optionally seed the DB with defaults?
@@ -106,13 +109,31 @@ class ConfigManager:
     def get_all_configs(self) -> Dict[str, Any]:
         return self.config
 
+    @staticmethod
+    def _serialize(config: Dict[str, Any]) -> Dict[str, Any]:
+        # LLMProvider enums are not BSON encodable
+        def _backend(settings: Dict[str, Any]) -> Dict[str, Any]:
+            return {**settings, "provider": LLMProvider(settings["provider"]).value}
+
+        return {
+            agent: {**_backend(settings), "fallbacks": [_backend(f) for f in settings.get("fallbacks", [])]}
+            for agent, settings in config.items()
+        }
+
+    def _has_changes(self, new_config: Dict[str, Any]) -> bool:
+        current = {agent: self.config[agent] for agent in new_config if agent in self.config}
+        return self._serialize(current) != self._serialize(new_config)
+
     async def update_config(self, new_config: Dict[str, Any]):
         """
         Updates the configuration in memory and persists it to the database.
         """
         try:
             # Validate or sanitize new_config here if necessary
-            self.config.update(new_config)
+            # swap the whole dict so readers never observe a half-applied update
+            if self._has_changes(new_config):
+                self.config = {**self.config, **new_config}
+                self.version += 1
             
             if not mongo.client:
                 logger.warning("MongoDB client not connected. Config updated in memory only.")
@@ -120,7 +141,7 @@ class ConfigManager:
 
             await mongo.db[self._db_collection_name].update_one(
                 {"name": self._config_doc_name},
-                {"$set": {"config": self.config}},
+                {"$set": {"config": self._serialize(self.config)}},
                 upsert=True
             )
             logger.info("Agent configurations updated in database.")
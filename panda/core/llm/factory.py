@@ -1,3 +1,8 @@
+import logging
+from typing import Any, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel
+from langchain_core.runnables import RunnableLambda
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_openai import ChatOpenAI
 try:
@@ -11,6 +16,22 @@ from panda import Config
 
 
 from panda.core.llm.config_manager import config_manager
+from panda.core.llm.client_pool import client_registry
+from panda.core.concurrency import provider_limiter
+from panda.core.llm.routing import Candidate, LLMRouter
+
+logger = logging.getLogger(__name__)
+
+
+PROVIDER_BASE_URLS = {
+    LLMProvider.OPENROUTER: "https://openrouter.ai/api/v1",
+    LLMProvider.MISTRAL: "https://api.mistral.ai/v1",
+    LLMProvider.CEREBRAS: "https://api.cerebras.ai/v1",
+    LLMProvider.GROQ: "https://api.groq.com/openai/v1",
+}
+
+# (agent_name, schema) -> (config version, runnable)
+_agent_llm_cache: Dict[Tuple[str, Optional[type]], Tuple[int, Any]] = {}
 
 
 class LLMFactory:
@@ -32,7 +53,7 @@ class LLMFactory:
         config = LLMFactory.get_model_config(agent_name)
         
         # Override config with kwargs if provided
-        provider = kwargs.pop("provider", config["provider"])
+        provider = LLMProvider(kwargs.pop("provider", config["provider"]))
         model_name = kwargs.pop("model_name", config["model_name"])
         temperature = kwargs.pop("temperature", config.get("temperature", 0.7))
         
@@ -43,8 +64,61 @@ class LLMFactory:
             **kwargs
         )
 
+    @staticmethod
+    def get_agent_llm(agent_name: str, schema: Optional[Type[BaseModel]] = None):
+        """
+        Returns the runnable bound to the agent's current config, with structured output if a schema is given.
+        Calls go to the configured model first and fail over to the agent's "fallbacks", see LLMRouter.
+        Bindings are cached per config version, so ConfigManager.update_config swaps them on the next call
+        while in-flight requests keep the runnable they already resolved.
+        """
+        version = config_manager.version
+        cached = _agent_llm_cache.get((agent_name, schema))
+        if cached and cached[0] == version:
+            return cached[1]
+
+        config = LLMFactory.get_model_config(agent_name)
+        candidates = []
+        for i, backend in enumerate([config, *config.get("fallbacks", [])]):
+            provider = LLMProvider(backend["provider"])
+            try:
+                client = LLMFactory.create_client(
+                    provider=provider,
+                    model_name=backend["model_name"],
+                    temperature=backend.get("temperature") if backend.get("temperature") is not None else config.get("temperature", 0.7),
+                )
+            except (InvalidAPIKey, ImportError) as e:
+                if i == 0:
+                    raise
+                logger.warning(f"Skipping fallback {provider.value}/{backend['model_name']} for {agent_name}: {e}")
+                continue
+            if schema is not None:
+                client = client.with_structured_output(schema)
+            # every call holds a slot of the provider's concurrency limit
+            candidates.append(Candidate(provider, backend["model_name"], client, provider_limiter.get(provider)))
+
+        router = LLMRouter(agent_name, candidates)
+        llm = RunnableLambda(router.invoke, afunc=router.ainvoke, name=f"{agent_name}_llm")
+
+        _agent_llm_cache[(agent_name, schema)] = (version, llm)
+        return llm
+
     @staticmethod
     def create_client(provider: LLMProvider, **kwargs):
+        """
+        Returns the pooled client for (provider, model_name, temperature, base_url),
+        building it on first use.
+        """
+        key = (
+            provider,
+            kwargs.get("model_name"),
+            kwargs.get("temperature", 0.7),
+            PROVIDER_BASE_URLS.get(provider),
+        )
+        return client_registry.get_or_create(key, lambda: LLMFactory._build_client(provider, **kwargs))
+
+    @staticmethod
+    def _build_client(provider: LLMProvider, **kwargs):
         if provider == LLMProvider.GEMINI:
             if not Config.GEMINI_API:
                 raise InvalidAPIKey("No valid API Key has been provided to run Gemini")
@@ -53,8 +127,8 @@ class LLMFactory:
                 model=kwargs.get("model_name", "gemini-1.5-flash"),
                 temperature=kwargs.get("temperature", 0.7),
                 google_api_key=Config.GEMINI_API,
-                max_retries=3,
-                timeout=30,
+                max_retries=Config.LLM_MAX_RETRIES,
+                timeout=Config.LLM_TIMEOUT,
             )
 
         elif provider == LLMProvider.OPENROUTER:
@@ -65,9 +139,10 @@ class LLMFactory:
                 model=kwargs.get("model_name", "xiaomi/mimo-v2-flash:free"),
                 temperature=kwargs.get("temperature", 0.7),
                 api_key=Config.OPENROUTER_API_KEY,
-                base_url="https://openrouter.ai/api/v1",
-                max_retries=3,
-                timeout=30,
+                base_url=PROVIDER_BASE_URLS[provider],
+                http_async_client=client_registry.get_http_client(provider),
+                max_retries=Config.LLM_MAX_RETRIES,
+                timeout=Config.LLM_TIMEOUT,
                 default_headers={
                     "HTTP-Referer": kwargs.get("referer", "https://test.itsvinayak.eu.org"),
                     "X-Title": kwargs.get("app_name", "Panda"),
@@ -92,8 +167,18 @@ class LLMFactory:
                 model=kwargs.get("model_name", "mistral-small-latest"),
                 temperature=kwargs.get("temperature", 0.7),
                 mistral_api_key=api_key,
-                max_retries=3,
-                timeout=30,
+                endpoint=PROVIDER_BASE_URLS[provider],
+                async_client=client_registry.get_http_client(
+                    provider,
+                    base_url=PROVIDER_BASE_URLS[provider],
+                    headers={
+                        "Content-Type": "application/json",
+                        "Accept": "application/json",
+                        "Authorization": f"Bearer {api_key}",
+                    },
+                ),
+                max_retries=Config.LLM_MAX_RETRIES,
+                timeout=Config.LLM_TIMEOUT,
             )
 
         elif provider == LLMProvider.CEREBRAS:
@@ -110,9 +195,10 @@ class LLMFactory:
                 model=kwargs.get("model_name", "llama3.1-8b"),
                 temperature=kwargs.get("temperature", 0.7),
                 api_key=api_key,
-                base_url="https://api.cerebras.ai/v1",
-                max_retries=3,
-                timeout=30,
+                base_url=PROVIDER_BASE_URLS[provider],
+                http_async_client=client_registry.get_http_client(provider),
+                max_retries=Config.LLM_MAX_RETRIES,
+                timeout=Config.LLM_TIMEOUT,
             )
 
         elif provider == LLMProvider.GROQ:
@@ -129,9 +215,10 @@ class LLMFactory:
                 model=kwargs.get("model_name", "llama-3.1-8b-instant"),
                 temperature=kwargs.get("temperature", 0.7),
                 api_key=api_key,
-                base_url="https://api.groq.com/openai/v1",
-                max_retries=3,
-                timeout=30,
+                base_url=PROVIDER_BASE_URLS[provider],
+                http_async_client=client_registry.get_http_client(provider),
+                max_retries=Config.LLM_MAX_RETRIES,
+                timeout=Config.LLM_TIMEOUT,
             )
 
         else:
@@ -0,0 +1,274 @@
+import re
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from langchain_core.messages import HumanMessage
+
+from panda import Config
+from panda.models.errors import RateLimited
+from panda.models.llm import LLMProvider
+from panda.utils.ratelimit import TokenBucket
+from panda.utils.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# share of the RPM limit regained per successful call after a 429
+RECOVERY_STEP = 0.05
+
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+# Header names across OpenAI-compatible providers, Mistral and OpenRouter
+LIMIT_REQUESTS = ("x-ratelimit-limit-requests", "x-ratelimit-limit-requests-minute", "x-ratelimit-limit")
+LIMIT_TOKENS = ("x-ratelimit-limit-tokens", "x-ratelimit-limit-tokens-minute")
+REMAINING_REQUESTS = ("x-ratelimit-remaining-requests", "x-ratelimit-remaining-requests-minute", "x-ratelimit-remaining")
+REMAINING_TOKENS = ("x-ratelimit-remaining-tokens", "x-ratelimit-remaining-tokens-minute")
+RESET_REQUESTS = ("x-ratelimit-reset-requests", "x-ratelimit-reset")
+RESET_TOKENS = ("x-ratelimit-reset-tokens",)
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """Seconds from '20', '1.5s', '6m0s' or '20ms'"""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * DURATION_UNITS[unit] for n, unit in parts)
+
+
+def parse_reset(value: str) -> Optional[float]:
+    """Seconds until a reset given as a duration or an epoch timestamp, in s or ms"""
+    seconds = parse_duration(value)
+    if seconds is None:
+        return None
+    if seconds > 1e11:
+        seconds = seconds / 1000 - time.time()
+    elif seconds > 1e9:
+        seconds -= time.time()
+    return max(seconds, 0.0)
+
+
+def parse_retry_after(value: str) -> Optional[float]:
+    """Retry-After in seconds, either form of the header"""
+    seconds = parse_duration(value)
+    if seconds is not None:
+        return max(seconds, 0.0)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _header(headers, names: Tuple[str, ...]) -> Optional[str]:
+    for name in names:
+        value = headers.get(name)
+        if value:
+            return value
+    return None
+
+
+def _number(headers, names: Tuple[str, ...]) -> Optional[float]:
+    value = _header(headers, names)
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def estimate_tokens(inputs) -> int:
+    """Prompt tokens of an LLM call plus the completion tokens assumed per call"""
+    if hasattr(inputs, "to_messages"):
+        messages = inputs.to_messages()
+    else:
+        messages = [HumanMessage(content=str(inputs))]
+    return count_tokens(messages) + Config.LLM_RATE_LIMIT_OUTPUT_TOKENS
+
+
+def _burst(per_minute: float) -> float:
+    # up to 10 seconds worth of calls at once
+    return max(1.0, per_minute / 6)
+
+
+class AdaptiveRateLimiter:
+    """
+    Client-side limits for one (provider, model): a request bucket (RPM) and a token bucket (TPM).
+
+    Waiting callers are queued per user and served one user at a time in turn, so a user
+    with a burst of calls does not hold everyone else back. Limits are learned from
+    responses: x-ratelimit-limit-* headers set the ceilings, an exhausted remaining count
+    pauses the backend until its reset, and a 429 pauses it for Retry-After and halves the
+    request rate, which then climbs back by RECOVERY_STEP of the limit per successful call.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rpm_limit = Config.LLM_RATE_LIMIT_RPM
+        self.rpm = self.rpm_limit
+        self.tpm_limit = Config.LLM_RATE_LIMIT_TPM
+        self._learned = False
+        self._requests = TokenBucket(rate=self.rpm / 60, capacity=_burst(self.rpm))
+        self._tokens = TokenBucket(rate=self.tpm_limit / 60, capacity=_burst(self.tpm_limit)) if self.tpm_limit else None
+        self._paused_until = 0.0
+        # user_id -> waiting (future, tokens), in turn order
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        self.granted = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.pauses = 0
+        self._wait_times = deque(maxlen=1000)
+
+    def paused_for(self) -> float:
+        return max(self._paused_until - time.monotonic(), 0.0)
+
+    async def acquire(self, user_id: str, tokens: int):
+        """Wait for capacity, raising RateLimited when that would take longer than LLM_RATE_LIMIT_MAX_WAIT"""
+        if not Config.LLM_RATE_LIMIT_ENABLED:
+            return
+        if self.paused_for() > Config.LLM_RATE_LIMIT_MAX_WAIT:
+            self.rejected += 1
+            raise RateLimited(f"{self.name} is rate limited for another {self.paused_for():.0f}s")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(user_id, deque()).append((waiter, tokens))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, timeout=Config.LLM_RATE_LIMIT_MAX_WAIT)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise RateLimited(f"No {self.name} capacity within {Config.LLM_RATE_LIMIT_MAX_WAIT}s")
+        self._wait_times.append(time.perf_counter() - start)
+
+    async def _dispatch(self):
+        """Grant waiters one at a time, taking the queued users in turn"""
+        while self._queues:
+            user_id, waiters = next(iter(self._queues.items()))
+            waiter, tokens = waiters.popleft()
+            if waiters:
+                self._queues.move_to_end(user_id)
+            else:
+                del self._queues[user_id]
+            if waiter.done():
+                continue  # timed out or cancelled while queued
+
+            if self.paused_for():
+                await asyncio.sleep(self.paused_for())
+            await self._requests.acquire()
+            if self._tokens is not None:
+                await self._tokens.acquire(tokens)
+
+            if not waiter.done():
+                waiter.set_result(None)
+                self.granted += 1
+
+    def _pause(self, seconds: float):
+        if seconds and time.monotonic() + seconds > self._paused_until:
+            self._paused_until = time.monotonic() + seconds
+            self.pauses += 1
+
+    def _apply_rates(self):
+        self._requests.set_rate(self.rpm / 60, _burst(self.rpm))
+        if self.tpm_limit:
+            if self._tokens is None:
+                self._tokens = TokenBucket(rate=self.tpm_limit / 60, capacity=_burst(self.tpm_limit))
+            else:
+                self._tokens.set_rate(self.tpm_limit / 60, _burst(self.tpm_limit))
+
+    def observe(self, status: int, headers):
+        """Learn from the status and rate limit headers of a provider response"""
+        rpm_limit = _number(headers, LIMIT_REQUESTS)
+        if rpm_limit:
+            if not self._learned:
+                self.rpm = rpm_limit
+                self._learned = True
+            self.rpm_limit = rpm_limit
+            self.rpm = min(self.rpm, rpm_limit)
+        tpm_limit = _number(headers, LIMIT_TOKENS)
+        if tpm_limit:
+            self.tpm_limit = tpm_limit
+
+        for remaining_names, reset_names in ((REMAINING_REQUESTS, RESET_REQUESTS), (REMAINING_TOKENS, RESET_TOKENS)):
+            remaining, reset = _number(headers, remaining_names), _header(headers, reset_names)
+            if remaining is not None and remaining <= 0 and reset:
+                self._pause(parse_reset(reset))
+
+        if status == 429:
+            self.throttled += 1
+            retry_after = _header(headers, ("retry-after",))
+            reset = _header(headers, RESET_REQUESTS)
+            delay = (parse_retry_after(retry_after) if retry_after else None) \
+                or (parse_reset(reset) if reset else None) \
+                or Config.LLM_RATE_LIMIT_BACKOFF
+            self._pause(delay)
+            self.rpm = max(1.0, self.rpm / 2)
+            logger.warning(f"{self.name} returned 429, pausing {delay:.1f}s at {self.rpm:.0f} RPM")
+        elif status < 400 and self.rpm < self.rpm_limit:
+            self.rpm = min(self.rpm_limit, self.rpm + max(1.0, self.rpm_limit * RECOVERY_STEP))
+
+        self._apply_rates()
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._wait_times)
+        return {
+            "rpm": round(self.rpm, 1),
+            "rpm_limit": self.rpm_limit,
+            "tpm_limit": self.tpm_limit,
+            "paused_for": round(self.paused_for(), 1),
+            "queued": sum(len(w) for w in self._queues.values()),
+            "queued_users": len(self._queues),
+            "granted": self.granted,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+            "pauses": self.pauses,
+            "wait_ms_p50": waits[len(waits) // 2] * 1000 if waits else 0.0,
+            "wait_ms_p95": waits[int(len(waits) * 0.95)] * 1000 if waits else 0.0,
+        }
+
+
+class RateLimitRegistry:
+    """One AdaptiveRateLimiter per (provider, model)."""
+
+    def __init__(self):
+        self._limiters: Dict[Tuple[LLMProvider, str], AdaptiveRateLimiter] = {}
+
+    def get(self, provider: LLMProvider, model_name: str) -> AdaptiveRateLimiter:
+        key = (provider, model_name)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(f"{provider.value}/{model_name}")
+            self._limiters[key] = limiter
+        return limiter
+
+    def response_hook(self, provider: LLMProvider) -> Callable:
+        """httpx response hook feeding a provider's responses to the limiter of the requested model"""
+
+        async def observe(response):
+            try:
+                model_name = json.loads(response.request.content).get("model")
+            except Exception:
+                return
+            limiter = self._limiters.get((provider, model_name))
+            if limiter is not None:
+                limiter.observe(response.status_code, response.headers)
+
+        return observe
+
+    def stats(self) -> Dict[str, Any]:
+        return {f"{provider.value}/{model}": limiter.stats() for (provider, model), limiter in self._limiters.items()}
+
+
+# Global instance
+llm_rate_limits = RateLimitRegistry()
@@ -0,0 +1,183 @@
+import re
+import asyncio
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, Optional, Set, Tuple, Type
+
+from pydantic import BaseModel
+
+from panda import Config
+from panda.models.llm import LLMProvider
+from panda.core.llm.config_manager import config_manager
+from panda.database.mongo.connection import mongo, COLLECTIONS
+from panda.utils.cache import LRUCache, messages_digest
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+# Agents whose responses are shared across users and conversations, see cache_scope
+SHARED_AGENTS = {"supervisor"}
+
+# Near-duplicate matching only for short routing labels, a near-identical question can need a different answer
+NEAR_DUPLICATE_AGENTS = {"supervisor"}
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(_PUNCTUATION.sub(" ", text.lower()).split())
+
+
+def ngram_signature(text: str, n: int = 3) -> FrozenSet[str]:
+    """Character n-gram set used for near-duplicate matching."""
+    padded = f" {text} "
+    if len(padded) <= n:
+        return frozenset([padded])
+    return frozenset(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+def cache_scope(agent_name: str, state: dict, prompt_history: Optional[list] = None) -> str:
+    """
+    Routing labels only depend on what the supervisor sees, so they are shared by every
+    conversation with the same bounded prompt history (prompt_history, without the latest
+    message). Replies are kept per user.
+    """
+    if agent_name in SHARED_AGENTS:
+        return messages_digest(prompt_history or [])
+    return f"user:{state.get('user_id')}"
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class ResponseCache:
+    """
+    Caches structured agent responses keyed on (agent, model config, scope, normalized message),
+    the scope being the bounded prompt history for routing and the user for replies (see cache_scope).
+    Exact matches are served from an in-process TTL/LRU tier backed by an optional Mongo tier,
+    near-duplicates are matched on character trigram similarity within the same agent, model and
+    scope, for NEAR_DUPLICATE_AGENTS only.
+    """
+
+    def __init__(self):
+        self._memory = LRUCache(max_size=Config.RESPONSE_CACHE_MAX_SIZE, ttl=Config.RESPONSE_CACHE_TTL)
+        self.enabled_agents = {
+            agent.strip() for agent in Config.RESPONSE_CACHE_AGENTS.split(",") if agent.strip()
+        }
+        self.hits = 0
+        self.near_hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+        # the loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+    def is_enabled(self, agent_name: str) -> bool:
+        return agent_name in self.enabled_agents
+
+    @staticmethod
+    def _fingerprint(agent_name: str) -> str:
+        config = config_manager.get_candidate_config(agent_name)
+        provider = LLMProvider(config["provider"]).value
+        return f"{provider}:{config['model_name']}:{config.get('temperature', 0.7)}"
+
+    async def aget(self, agent_name: str, text: str, schema: Type[BaseModel], scope: str = "") -> Optional[BaseModel]:
+        """Return a cached response for the message within scope, or None on a miss."""
+        if not self.is_enabled(agent_name):
+            return None
+
+        normalized = normalize_text(text)
+        bucket = (agent_name, self._fingerprint(agent_name), scope)
+        key = (*bucket, normalized)
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            self.hits += 1
+            return schema.model_validate(entry[0])
+
+        entry = self._find_near_duplicate(bucket, ngram_signature(normalized)) if agent_name in NEAR_DUPLICATE_AGENTS else None
+        if entry is not None:
+            self.near_hits += 1
+            return schema.model_validate(entry[0])
+
+        if Config.RESPONSE_CACHE_MONGO and mongo.db is not None:
+            try:
+                doc = await mongo.db[COLLECTIONS['response_cache']].find_one({"_id": self._doc_id(key)})
+                if doc:
+                    self.mongo_hits += 1
+                    self._memory.set(key, (doc["payload"], ngram_signature(normalized)))
+                    return schema.model_validate(doc["payload"])
+            except Exception as e:
+                logger.error(f"Response cache lookup failed: {e}")
+
+        self.misses += 1
+        return None
+
+    async def aset(self, agent_name: str, text: str, response: BaseModel, scope: str = ""):
+        """Store a response for the message within scope if the agent opted in."""
+        if not self.is_enabled(agent_name):
+            return
+
+        normalized = normalize_text(text)
+        key = (agent_name, self._fingerprint(agent_name), scope, normalized)
+        payload = response.model_dump()
+        self._memory.set(key, (payload, ngram_signature(normalized)))
+
+        if Config.RESPONSE_CACHE_MONGO and mongo.db is not None:
+            # second tier write is off the hot path
+            task = asyncio.create_task(self._persist(key, payload))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _find_near_duplicate(self, bucket: Tuple[str, str, str], signature: FrozenSet[str]) -> Optional[Tuple[Dict[str, Any], FrozenSet[str]]]:
+        best, best_score = None, Config.RESPONSE_CACHE_SIMILARITY
+        for key, entry in self._memory.items():
+            if key[:3] != bucket:
+                continue
+            score = _jaccard(signature, entry[1])
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    @staticmethod
+    def _doc_id(key: Tuple[str, str, str, str]) -> str:
+        return hashlib.sha1("|".join(key).encode("utf-8")).hexdigest()
+
+    async def _persist(self, key: Tuple[str, str, str, str], payload: Dict[str, Any]):
+        try:
+            await mongo.db[COLLECTIONS['response_cache']].update_one(
+                {"_id": self._doc_id(key)},
+                {
+                    "$set": {
+                        "agent": key[0],
+                        "model": key[1],
+                        "scope": key[2],
+                        "text": key[3],
+                        "payload": payload,
+                        "created_at": datetime.utcnow()
+                    }
+                },
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Failed to persist cached response: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.near_hits + self.mongo_hits + self.misses
+        served = lookups - self.misses
+        return {
+            "agents": sorted(self.enabled_agents),
+            "size": len(self._memory),
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "mongo_hits": self.mongo_hits,
+            "misses": self.misses,
+            "hit_rate": served / lookups if lookups else 0.0,
+        }
+
+
+# Global instance
+response_cache = ResponseCache()
@@ -0,0 +1,233 @@
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from panda import Config
+from panda.models.llm import LLMProvider
+from panda.models.errors import BackendUnavailable
+from panda.core.llm.rate_limiter import llm_rate_limits, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class BackendHealth:
+    """
+    Health of one (provider, model) backend: a circuit breaker plus recent latencies.
+
+    After LLM_BREAKER_FAILURES consecutive failures the breaker opens and the backend
+    is skipped for LLM_BREAKER_COOLDOWN seconds. It is then half-open: a single probe
+    call goes through while other calls skip the backend, a success closes the breaker
+    and a failure opens it again.
+    """
+
+    def __init__(self):
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.consecutive_failures = 0
+        self.calls = 0
+        self.failures = 0
+        self.opens = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.last_error: Optional[str] = None
+        self.probing = False
+        self._latencies = deque(maxlen=200)
+
+    def available(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < Config.LLM_BREAKER_COOLDOWN:
+                return False
+            self.state = "half_open"
+        return not (self.state == "half_open" and self.probing)
+
+    def claim_probe(self) -> bool:
+        """Take the half-open probe for a call, True if this call is the probe"""
+        if self.state != "half_open":
+            return False
+        if self.probing:
+            raise BackendUnavailable("Half-open backend is already being probed")
+        self.probing = True
+        return True
+
+    def record_success(self, latency: float):
+        self.calls += 1
+        self.consecutive_failures = 0
+        self.state = "closed"
+        self._latencies.append(latency)
+
+    def record_failure(self, error: Exception):
+        self.calls += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"[:200]
+        if self.state == "half_open" or self.consecutive_failures >= Config.LLM_BREAKER_FAILURES:
+            if self.state != "open":
+                self.opens += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def _percentile(self, q: float) -> Optional[float]:
+        latencies = sorted(self._latencies)
+        return latencies[int(len(latencies) * q)] if latencies else None
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, None until enough latencies are known"""
+        if len(self._latencies) < Config.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return max(self._percentile(0.95), Config.LLM_HEDGE_MIN_DELAY)
+
+    def stats(self) -> Dict[str, Any]:
+        p50, p95 = self._percentile(0.5), self._percentile(0.95)
+        return {
+            "state": self.state,
+            "calls": self.calls,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "opens": self.opens,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "latency_ms_p50": p50 * 1000 if p50 is not None else 0.0,
+            "latency_ms_p95": p95 * 1000 if p95 is not None else 0.0,
+            "last_error": self.last_error,
+        }
+
+
+class HealthRegistry:
+    """One BackendHealth per (provider, model), shared by every agent using that backend."""
+
+    def __init__(self):
+        self._backends: Dict[Tuple[LLMProvider, str], BackendHealth] = {}
+
+    def get(self, provider: LLMProvider, model_name: str) -> BackendHealth:
+        key = (provider, model_name)
+        health = self._backends.get(key)
+        if health is None:
+            health = BackendHealth()
+            self._backends[key] = health
+        return health
+
+    def stats(self) -> Dict[str, Any]:
+        return {f"{provider.value}/{model}": health.stats() for (provider, model), health in self._backends.items()}
+
+
+# Global instance
+llm_health = HealthRegistry()
+
+
+class Candidate:
+    """A client for one backend of an agent, with its concurrency limiter, rate limiter and health."""
+
+    def __init__(self, provider: LLMProvider, model_name: str, client, limiter):
+        self.provider = provider
+        self.model_name = model_name
+        self.client = client
+        self.limiter = limiter
+        self.rate_limiter = llm_rate_limits.get(provider, model_name)
+        self.health = llm_health.get(provider, model_name)
+
+    @property
+    def label(self) -> str:
+        return f"{self.provider.value}/{self.model_name}"
+
+
+class LLMRouter:
+    """
+    Calls an agent's ordered backend candidates: backends with an open breaker are
+    skipped and a failed call moves on to the next candidate. With LLM_HEDGE_ENABLED,
+    a call still running after the backend's p95 latency is raced against a second
+    request to the next candidate (or the same one if it is the last), and the
+    first answer wins.
+    """
+
+    def __init__(self, agent_name: str, candidates: List[Candidate]):
+        self.agent_name = agent_name
+        self.candidates = candidates
+
+    def _usable(self) -> List[Candidate]:
+        # with every breaker open, still try the primary rather than failing outright
+        return [c for c in self.candidates if c.health.available()] or self.candidates[:1]
+
+    async def _attempt(self, candidate: Candidate, inputs, config):
+        # queued fairly per user, raises RateLimited to fail over when the backend is saturated
+        user_id = (config or {}).get("configurable", {}).get("user_id") or "anonymous"
+        probe = candidate.health.claim_probe()
+        try:
+            await candidate.rate_limiter.acquire(user_id, estimate_tokens(inputs))
+            async with candidate.limiter.slot():
+                start = time.perf_counter()
+                try:
+                    result = await candidate.client.ainvoke(inputs, config)
+                except Exception as e:
+                    candidate.health.record_failure(e)
+                    raise
+            candidate.health.record_success(time.perf_counter() - start)
+            return result
+        finally:
+            if probe:
+                candidate.health.probing = False
+
+    async def _hedged(self, primary: Candidate, remaining: List[Candidate], delay: float, inputs, config):
+        first = asyncio.ensure_future(self._attempt(primary, inputs, config))
+        pending, error = {first}, None
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return first.result()
+
+            # the backup is used up by the hedge, a failure moves on past it
+            backup = remaining.pop(0) if remaining else primary
+            primary.health.hedges += 1
+            second = asyncio.ensure_future(self._attempt(backup, inputs, config))
+            pending = {first, second}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            primary.health.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def ainvoke(self, inputs, config=None):
+        remaining = self._usable()
+        error = None
+        while remaining:
+            primary = remaining.pop(0)
+            delay = primary.health.hedge_delay() if Config.LLM_HEDGE_ENABLED else None
+            try:
+                if delay is None:
+                    return await self._attempt(primary, inputs, config)
+                return await self._hedged(primary, remaining, delay, inputs, config)
+            except Exception as e:
+                error = e
+                logger.warning(f"{self.agent_name} call to {primary.label} failed ({type(e).__name__}: {e})")
+        raise error
+
+    def invoke(self, inputs, config=None):
+        error = None
+        for candidate in self._usable():
+            start = time.perf_counter()
+            try:
+                probe = candidate.health.claim_probe()
+            except BackendUnavailable as e:
+                error = e
+                continue
+            try:
+                result = candidate.client.invoke(inputs, config)
+            except Exception as e:
+                candidate.health.record_failure(e)
+                error = e
+                continue
+            else:
+                candidate.health.record_success(time.perf_counter() - start)
+                return result
+            finally:
+                if probe:
+                    candidate.health.probing = False
+        raise error
@@ -1,14 +1,23 @@
 import asyncio
 import json
+import logging
+from typing import Optional, Tuple
 
+import httpx
 from aiogoogle import Aiogoogle
+from aiogoogle.excs import HTTPError
 from datetime import datetime
+from pymongo import UpdateOne
 
 from panda import Config
 from panda.database.mongo.connection import mongo, COLLECTIONS
-from panda.utils.text import clean_text, clean_urls
+from panda.core.tools.gmail_discovery import discovery_cache
+from panda.core.tools.gmail_batch import gmail_batch, BatchError, MAX_BATCH_SIZE
+from panda.utils.text import decode_base64url, strip_html, clean_urls
+from panda.utils.cache import LRUCache
+from panda.core.concurrency import cpu_pool
 
-from bs4 import BeautifulSoup
+logger = logging.getLogger(__name__)
 
 SCOPES = [
     "https://www.googleapis.com/auth/gmail.send",
@@ -16,113 +25,309 @@ SCOPES = [
 ]
 
 
+def _find_part(payload: dict, mime_type: str) -> Optional[dict]:
+    """First part of the given type in depth-first order, walked without recursion."""
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        if part.get('mimeType') == mime_type and part.get('body', {}).get('data'):
+            return part
+        # reversed so the first child is visited first
+        stack.extend(reversed(part.get('parts', [])))
+    return None
+
+
 def _extract_message_text(payload):
+    max_chars = Config.EMAIL_BODY_MAX_CHARS
 
-    def search_parts(parts, mime_type):
-        for part in parts:
-            if part['mimeType'] == mime_type:
-                return clean_text(part['body'].get('data', ''))
-            if 'parts' in part:
-                found = search_parts(part['parts'], mime_type)
-                if found: return found
-        return None
-
-    text_content = None
-    if 'parts' in payload:
-        text_content = search_parts(payload['parts'], 'text/plain')
-    
-    if not text_content:
-        if payload.get('mimeType') == 'text/html':
-            html_content = clean_text(payload['body'].get('data', ''))
-        elif 'parts' in payload:
-            html_content = search_parts(payload['parts'], 'text/html')
-        else:
-            html_content = ""
-            
-        if html_content:
-            soup = BeautifulSoup(html_content, "html.parser")
-            text_content = soup.get_text(separator=' ')
+    part = _find_part(payload, 'text/plain')
+    if part:
+        text_content = decode_base64url(part['body']['data'], max_chars)
+    else:
+        part = _find_part(payload, 'text/html')
+        # markup makes html a few times longer than its text
+        text_content = strip_html(decode_base64url(part['body']['data'], max_chars * 4)) if part else ""
 
     if text_content:
-        text = " ".join(text_content.split())
+        text = " ".join(text_content.split())[:max_chars]
         return clean_urls(text)
         
     return ""
 
 
-async def poll_gmail_updates(username: str): 
-    while True:
+def _parse_message(full_msg: dict) -> dict:
+    """Turn a Gmail messages.get response into the email dict used by the agents"""
+    headers = full_msg['payload']['headers']
+    subject = next((h['value'] for h in headers if h['name'] == 'Subject'), "No Subject")
+    sender = next((h['value'] for h in headers if h['name'] == 'From'), "Unknown")
+
+    return {
+        "id": full_msg['id'],
+        "sender": sender,
+        "subject": subject,
+        "body": _extract_message_text(full_msg['payload']),
+        "headers": {h['name'].lower(): h['value'] for h in headers if h['name'].lower() in TRIAGE_HEADERS}
+    }
+
+
+# email ids known to be processed, in front of the processed_emails collection
+_recently_processed = LRUCache(max_size=Config.PROCESSED_EMAIL_CACHE_SIZE)
+_dedup_stats = {"cache_hits": 0, "mongo_queries": 0, "mongo_writes": 0}
+
+# Only the parts of a message the agents use
+MESSAGE_FIELDS = "id,payload(mimeType,headers,body/data,parts)"
+
+# Headers kept on parsed emails for triage
+TRIAGE_HEADERS = {"list-unsubscribe", "list-id", "precedence", "auto-submitted"}
+
+# Labels that take a message out of the primary inbox
+NON_PRIMARY_LABELS = {"CATEGORY_PROMOTIONS", "CATEGORY_SOCIAL", "CATEGORY_UPDATES", "CATEGORY_FORUMS", "SPAM", "TRASH"}
+
+
+async def _call(aiogoogle, request, user_creds, rate_limiter=None):
+    if rate_limiter:
+        await rate_limiter.acquire()
+    return await aiogoogle.as_user(request, user_creds=user_creds)
+
+
+async def _full_resync(aiogoogle, gmail, user_creds, rate_limiter=None) -> Tuple[list, str]:
+    """
+    Bounded listing of unread primary messages, used when there is no usable history id.
+    The history id is read first so nothing arriving during the listing is missed.
+    """
+    profile = await _call(aiogoogle, gmail.users.getProfile(userId='me'), user_creds, rate_limiter)
+
+    response = await _call(aiogoogle, gmail.users.messages.list(
+        userId='me',
+        labelIds=['INBOX'],
+        q='is:unread category:primary',
+        maxResults=Config.GMAIL_RESYNC_MAX_MESSAGES
+    ), user_creds, rate_limiter)
+
+    ids = [m['id'] for m in response.get('messages', [])]
+    return ids, profile['historyId']
+
+
+async def list_new_message_ids(aiogoogle, gmail, user_creds, history_id: Optional[str] = None, rate_limiter=None) -> Tuple[list, str]:
+    """
+    Ids of messages added to the primary inbox since history_id, and the history id to resume from.
+    Falls back to a bounded full resync when history_id is missing or has expired.
+    When GMAIL_HISTORY_MAX_PAGES is reached the id of the last record read is returned,
+    so the next poll picks up the remaining pages.
+    """
+    if not history_id:
+        return await _full_resync(aiogoogle, gmail, user_creds, rate_limiter)
+
+    ids, page_token = [], None
+    latest_history_id = last_record_id = history_id
+    for _ in range(Config.GMAIL_HISTORY_MAX_PAGES):
         try:
-            user = await mongo.db[COLLECTIONS['users']].find_one({'username': username})
-            if not user:
-                break
-                
-            creds = user.get('gmail_credentials')
+            response = await _call(aiogoogle, gmail.users.history.list(
+                userId='me',
+                startHistoryId=history_id,
+                historyTypes=['messageAdded'],
+                labelId='INBOX',
+                pageToken=page_token
+            ), user_creds, rate_limiter)
+        except HTTPError as e:
+            if e.res is not None and e.res.status_code == 404:
+                # history id too old, Gmail only keeps about a week of history
+                return await _full_resync(aiogoogle, gmail, user_creds, rate_limiter)
+            raise
+
+        latest_history_id = response.get('historyId', latest_history_id)
+        for record in response.get('history', []):
+            for added in record.get('messagesAdded', []):
+                message = added['message']
+                labels = set(message.get('labelIds', []))
+                if 'UNREAD' in labels and not labels & NON_PRIMARY_LABELS and message['id'] not in ids:
+                    ids.append(message['id'])
+            last_record_id = record.get('id', last_record_id)
+
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return ids, latest_history_id
+
+    # pages left unread: resume after the last record handled, the mailbox's current id would skip them
+    logger.warning(f"History listing stopped after {Config.GMAIL_HISTORY_MAX_PAGES} pages, resuming from {last_record_id}")
+    return ids, last_record_id
+
+
+def _payload_size(payload: dict) -> int:
+    """Total encoded size of the message's inline body parts."""
+    size, stack = 0, [payload]
+    while stack:
+        part = stack.pop()
+        size += len(part.get('body', {}).get('data', ''))
+        stack.extend(part.get('parts', []))
+    return size
+
+
+async def parse_message(full_msg: dict) -> dict:
+    """Parse a message, in the CPU pool when its body is large enough to stall the event loop."""
+    return await cpu_pool.run(_parse_message, full_msg, size=_payload_size(full_msg['payload']))
+
+
+async def fetch_new_emails(aiogoogle, gmail, user_creds, history_id: Optional[str] = None,
+                           semaphore: asyncio.Semaphore = None, rate_limiter=None) -> Tuple[list, str]:
+    """
+    Fetch the messages added since history_id that were not processed yet.
+    
+    Args:
+        aiogoogle: Aiogoogle client with an open session
+        gmail: Discovered Gmail API
+        user_creds: The user's OAuth credentials
+        history_id: The user's last synced history id, None for a full resync
+        semaphore: Bounds concurrent messages.get calls for this user
+        rate_limiter: Optional shared TokenBucket throttling Gmail API calls
+
+    Returns:
+        (emails, history id to store for the next poll)
+    """
+    semaphore = semaphore or asyncio.Semaphore(1)
+
+    message_ids, new_history_id = await list_new_message_ids(aiogoogle, gmail, user_creds, history_id, rate_limiter)
+
+    new_ids = await filter_unprocessed(message_ids)
+
+    emails = await fetch_messages(aiogoogle, gmail, user_creds, new_ids, semaphore, rate_limiter)
+    return emails, new_history_id
+
+
+def _get_message_request(gmail, msg_id: str):
+    return gmail.users.messages.get(
+        userId='me',
+        id=msg_id,
+        format='full',
+        fields=MESSAGE_FIELDS
+    )
+
+
+async def fetch_messages(aiogoogle, gmail, user_creds, message_ids: list,
+                         semaphore: asyncio.Semaphore = None, rate_limiter=None) -> list:
+    """
+    Fetch and parse messages, grouped into Gmail batch requests when enabled.
+    Items a batch could not return are fetched again one by one.
+    """
+    semaphore = semaphore or asyncio.Semaphore(1)
+
+    async def fetch(msg_id):
+        async with semaphore:
+            full_msg = await _call(aiogoogle, _get_message_request(gmail, msg_id), user_creds, rate_limiter)
+        return await parse_message(full_msg)
+
+    async def fetch_batch(chunk):
+        async with semaphore:
+            if rate_limiter:
+                await rate_limiter.acquire(len(chunk))
+            try:
+                bodies = await gmail_batch.send([_get_message_request(gmail, msg_id) for msg_id in chunk], user_creds)
+            except (httpx.HTTPError, BatchError) as e:
+                print(f"Batch fetch failed, falling back to single requests: {e}")
+                bodies = [None] * len(chunk)
+
+        missing = [msg_id for msg_id, body in zip(chunk, bodies) if body is None]
+        retried = dict(zip(missing, await asyncio.gather(*(fetch(msg_id) for msg_id in missing))))
+        parsed = await asyncio.gather(*(parse_message(body) for body in bodies if body is not None))
+        parsed_by_id = {email_obj['id']: email_obj for email_obj in parsed}
+        return [parsed_by_id.get(msg_id) or retried[msg_id] for msg_id in chunk]
+
+    if not Config.GMAIL_BATCH_ENABLED or len(message_ids) < 2:
+        return list(await asyncio.gather(*(fetch(msg_id) for msg_id in message_ids)))
+
+    size = min(Config.GMAIL_BATCH_SIZE, MAX_BATCH_SIZE)
+    chunks = [message_ids[i:i + size] for i in range(0, len(message_ids), size)]
+    results = await asyncio.gather(*(fetch_batch(chunk) for chunk in chunks))
+    return [email_obj for chunk in results for email_obj in chunk]
+
+
+async def poll_gmail_updates(username: str): 
+    """
+    One-off poll for a single user.
+    GmailPoller runs the same fetch continuously for every connected user. The history
+    cursor is left where it is: the caller only reads the emails, GmailPoller advances
+    it once they are handled.
+    """
+    try:
+        user = await mongo.db[COLLECTIONS['users']].find_one({'username': username})
+        if not user:
+            return []
             
-            # 2. Authenticate
-            async with Aiogoogle(client_creds=GmailWrapper.get_client_creds(), user_creds=creds) as aiogoogle:
-                gmail = await aiogoogle.discover('gmail', 'v1')
-                
-                response = await aiogoogle.as_user(
-                    gmail.users.messages.list(
-                        userId='me',
-                        labelIds=['INBOX'],
-                        q='is:unread category:primary',
-                        maxResults=5
-                    )
-                )
-                
-                messages = response.get('messages', [])
-                
-                if messages:
-                    for msg_summary in messages:
-                        msg_id = msg_summary['id']
-
-                        if await is_message_processed(msg_id): 
-                            continue
-
-                        full_msg = await aiogoogle.as_user(
-                            gmail.users.messages.get(
-                                userId='me', 
-                                id=msg_id
-                            )
-                        )
-
-                        headers = full_msg['payload']['headers']
-                        subject = next((h['value'] for h in headers if h['name'] == 'Subject'), "No Subject")
-                        sender = next((h['value'] for h in headers if h['name'] == 'From'), "Unknown")
-                        body = _extract_message_text(full_msg['payload'])
-
-                        email_obj = {
-                            "id": msg_id,
-                            "sender": sender,
-                            "subject": subject,
-                            "body": body
-                        }
-                        print(email_obj)
-                        
-                        #await mark_message_as_processed(msg_id)
-                
-                else:
-                    print("No new mail.")
-
-        except Exception as e:
-            print(f"Error during polling: {e}")
+        creds = user.get('gmail_credentials')
         
-        break
-        await asyncio.sleep(10) 
+        async with Aiogoogle(client_creds=get_client_creds(), user_creds=creds) as aiogoogle:
+            gmail = await discovery_cache.get('gmail', 'v1')
+            emails, _ = await fetch_new_emails(aiogoogle, gmail, creds, user.get('gmail_history_id'))
+
+        if not emails:
+            print("No new mail.")
+        for email_obj in emails:
+            logger.debug(f"Polled email {email_obj.get('id')}: {email_obj.get('subject')}")
+
+        return emails
+
+    except Exception as e:
+        print(f"Error during polling: {e}")
+        return []
+
+
+async def filter_unprocessed(email_ids: list) -> list:
+    """
+    Return the ids not processed yet, in their original order.
+    Recently processed ids are answered from memory, the rest with a single $in query.
+    """
+    unknown = [email_id for email_id in email_ids if email_id not in _recently_processed]
+    _dedup_stats["cache_hits"] += len(email_ids) - len(unknown)
+
+    if unknown:
+        _dedup_stats["mongo_queries"] += 1
+        cursor = mongo.db[COLLECTIONS['processed_emails']].find(
+            {'email_id': {'$in': unknown}},
+            {'email_id': 1, '_id': 0}
+        )
+        async for doc in cursor:
+            _recently_processed.set(doc['email_id'], True)
+
+    return [email_id for email_id in email_ids if email_id not in _recently_processed]
+
+
+async def mark_messages_as_processed(email_ids: list):
+    """Record processed ids with one unordered bulk upsert, safe to repeat."""
+    if not email_ids:
+        return
+
+    processed_at = datetime.utcnow()
+    await mongo.db[COLLECTIONS['processed_emails']].bulk_write([
+        UpdateOne(
+            {'email_id': email_id},
+            {'$setOnInsert': {'email_id': email_id, 'processed_at': processed_at}},
+            upsert=True
+        )
+        for email_id in email_ids
+    ], ordered=False)
+    _dedup_stats["mongo_writes"] += 1
+
+    for email_id in email_ids:
+        _recently_processed.set(email_id, True)
 
 
 async def is_message_processed(email_id):
-    doc = await mongo.db[COLLECTIONS['processed_emails']].find_one({'email_id': email_id})
-    return doc is not None
+    return not await filter_unprocessed([email_id])
 
 
 async def mark_message_as_processed(email_id):
-    await mongo.db[COLLECTIONS['processed_emails']].insert_one({
-        'email_id': email_id,
-        'processed_at': datetime.utcnow() 
-    })
+    await mark_messages_as_processed([email_id])
+
+
+def dedup_stats() -> dict:
+    return {**_dedup_stats, "cached_ids": len(_recently_processed)}
+
+
+async def save_history_id(username: str, history_id: str):
+    await mongo.db[COLLECTIONS['users']].update_one(
+        {'username': username},
+        {'$set': {'gmail_history_id': history_id}}
+    )
 
 
 def get_client_creds():
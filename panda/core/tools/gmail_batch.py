@@ -0,0 +1,136 @@
+import json
+import uuid
+import logging
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Hard limit of the Google batch endpoint
+MAX_BATCH_SIZE = 100
+
+
+class BatchError(Exception):
+    pass
+
+
+def _encode_batch(requests: list, boundary: str) -> bytes:
+    """Encode aiogoogle requests as a multipart/mixed batch body."""
+    lines = []
+    for i, request in enumerate(requests):
+        url = urlsplit(request.url)
+        path = f"{url.path}?{url.query}" if url.query else url.path
+        lines += [
+            f"--{boundary}",
+            "Content-Type: application/http",
+            f"Content-ID: <item{i}>",
+            "",
+            f"{request.method} {path} HTTP/1.1",
+            "",
+        ]
+    lines.append(f"--{boundary}--")
+    return "\r\n".join(lines).encode()
+
+
+def _decode_batch(content: bytes, content_type: str) -> Dict[int, tuple]:
+    """Split a multipart/mixed batch response into {item index: (status, json body)}, skipping unparseable parts."""
+    boundary = None
+    for param in content_type.split(";"):
+        name, _, value = param.strip().partition("=")
+        if name == "boundary":
+            boundary = value.strip('"')
+    if not boundary:
+        raise BatchError(f"No boundary in batch response content type: {content_type}")
+
+    results = {}
+    for part in content.decode().split(f"--{boundary}"):
+        part = part.strip()
+        if not part or part == "--":
+            continue
+
+        part_headers, _, http_response = part.replace("\r\n", "\n").partition("\n\n")
+        content_id = next(
+            (line.split(":", 1)[1].strip() for line in part_headers.split("\n") if line.lower().startswith("content-id:")),
+            ""
+        )
+        status_line, _, rest = http_response.partition("\n")
+        _, _, body = rest.partition("\n\n")
+        try:
+            # "<response-item3>" -> 3
+            index = int(content_id.strip("<>").rsplit("item", 1)[-1])
+            status = int(status_line.split()[1])
+            results[index] = (status, json.loads(body) if body.strip() else None)
+        except (ValueError, IndexError):
+            # Leave the item out so the caller retries it on its own
+            logger.warning(f"Skipping malformed batch part {content_id or '<no content-id>'}: {status_line!r}")
+    return results
+
+
+class GmailBatchClient:
+    """
+    Sends groups of Gmail API GET requests through the HTTP batch endpoint,
+    one round-trip per group instead of one per request.
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self.batches = 0
+        self.items = 0
+        self.item_failures = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=10.0))
+        return self._client
+
+    async def send(self, requests: list, user_creds: dict) -> List[Optional[dict]]:
+        """
+        Send up to MAX_BATCH_SIZE requests in one batch.
+        Returns the JSON bodies in request order, None for items that failed.
+        """
+        if len(requests) > MAX_BATCH_SIZE:
+            raise ValueError(f"At most {MAX_BATCH_SIZE} requests per batch, got {len(requests)}")
+
+        boundary = f"batch_{uuid.uuid4().hex}"
+        response = await self._get_client().post(
+            requests[0].batch_url,
+            content=_encode_batch(requests, boundary),
+            headers={
+                "Authorization": f"Bearer {user_creds['access_token']}",
+                "Content-Type": f"multipart/mixed; boundary={boundary}",
+            },
+        )
+        response.raise_for_status()
+        results = _decode_batch(response.content, response.headers.get("Content-Type", ""))
+
+        self.batches += 1
+        self.items += len(requests)
+
+        bodies = []
+        for i in range(len(requests)):
+            status, body = results.get(i, (None, None))
+            if status != 200:
+                self.item_failures += 1
+                logger.warning(f"Batch item {i} failed with status {status}")
+                body = None
+            bodies.append(body)
+        return bodies
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "item_failures": self.item_failures,
+        }
+
+
+# Global instance
+gmail_batch = GmailBatchClient()
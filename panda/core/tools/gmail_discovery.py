@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+
+import httpx
+from aiogoogle.resource import GoogleAPI
+
+from panda import Config
+
+logger = logging.getLogger(__name__)
+
+DISCOVERY_URL = "https://www.googleapis.com/discovery/v1/apis/{api}/{version}/rest"
+
+
+class DiscoveryCache:
+    """
+    Process-wide cache of Google API discovery documents.
+
+    Documents are kept in memory once loaded and mirrored on disk together with
+    their ETag. A disk copy younger than DISCOVERY_CACHE_TTL is used as is; an
+    older one is revalidated with If-None-Match, and used anyway when Google
+    cannot be reached, so startup works offline.
+    """
+
+    def __init__(self, cache_dir: str, ttl: float):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self._apis: Dict[Tuple[str, str], GoogleAPI] = {}
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self.fetches = 0
+        self.not_modified = 0
+        self.disk_loads = 0
+        self.offline_loads = 0
+
+    async def get(self, api: str = "gmail", version: str = "v1") -> GoogleAPI:
+        """Return the GoogleAPI for api/version, loading the discovery document at most once."""
+        key = (api, version)
+        google_api = self._apis.get(key)
+        if google_api is not None:
+            return google_api
+
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            if key not in self._apis:
+                document = await self._load(api, version)
+                self._apis[key] = GoogleAPI(document)
+        return self._apis[key]
+
+    def invalidate(self, api: str = "gmail", version: str = "v1"):
+        """Forget the in-memory copy so the next get() goes through the disk/ETag check again."""
+        self._apis.pop((api, version), None)
+
+    def _path(self, api: str, version: str) -> str:
+        return os.path.join(self.cache_dir, f"{api}_{version}.json")
+
+    def _read_disk(self, api: str, version: str) -> Optional[dict]:
+        try:
+            with open(self._path(api, version), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, api: str, version: str, entry: dict):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(api, version)
+            # write then rename so concurrent processes never read a partial file
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write discovery cache for {api} {version}: {e}")
+
+    async def _load(self, api: str, version: str) -> dict:
+        cached = self._read_disk(api, version)
+        if cached and time.time() - cached.get("fetched_at", 0) < self.ttl:
+            self.disk_loads += 1
+            return cached["document"]
+
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+
+        try:
+            async with httpx.AsyncClient(timeout=httpx.Timeout(10.0)) as client:
+                response = await client.get(DISCOVERY_URL.format(api=api, version=version), headers=headers)
+        except httpx.HTTPError as e:
+            if cached:
+                self.offline_loads += 1
+                logger.warning(f"Discovery service unreachable ({e}), using cached {api} {version} document")
+                return cached["document"]
+            raise
+
+        if response.status_code == 304 and cached:
+            self.not_modified += 1
+            cached["fetched_at"] = time.time()
+            self._write_disk(api, version, cached)
+            return cached["document"]
+
+        response.raise_for_status()
+        document = response.json()
+        self.fetches += 1
+
+        if cached and cached["document"].get("revision") != document.get("revision"):
+            logger.info(f"Discovery document for {api} {version} updated to revision {document.get('revision')}")
+
+        self._write_disk(api, version, {
+            "etag": response.headers.get("ETag") or document.get("etag"),
+            "fetched_at": time.time(),
+            "document": document,
+        })
+        return document
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "loaded": len(self._apis),
+            "fetches": self.fetches,
+            "not_modified": self.not_modified,
+            "disk_loads": self.disk_loads,
+            "offline_loads": self.offline_loads,
+        }
+
+
+# Global instance
+discovery_cache = DiscoveryCache(Config.DISCOVERY_CACHE_DIR, Config.DISCOVERY_CACHE_TTL)
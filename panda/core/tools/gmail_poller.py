@@ -0,0 +1,310 @@
+import time
+import uuid
+import heapq
+import random
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from aiogoogle import Aiogoogle
+
+from panda import Config
+from panda.database.mongo.connection import mongo, COLLECTIONS
+from panda.core.tools.gmail_discovery import discovery_cache
+from panda.core.tools.gmail_batch import gmail_batch
+from panda.core.tools.gmail import fetch_new_emails, get_client_creds, mark_messages_as_processed, save_history_id, dedup_stats
+from panda.utils.ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+EmailHandler = Callable[[dict, List[dict]], Awaitable[None]]
+
+
+async def run_polling_graph(user: dict, emails: List[dict]):
+    """Default handler: feed newly fetched emails through the polling graph"""
+    from panda.agents.registry import graph_registry
+
+    poll_state = {
+        "messages": [],
+        "current_agent": "poll_emails",
+        "user_id": user["username"],
+        "conversation_id": f"poll_{datetime.now().timestamp()}",
+        "context": {"automated": True},
+        "pending_actions": [],
+        "requires_human": False,
+        "human_feedback": None,
+        "email_data": {"unprocessed_emails": emails},
+        "timestamp": datetime.now(),
+        "run_id": uuid.uuid4().hex
+    }
+    await graph_registry.get("polling").ainvoke(poll_state)
+
+
+class GmailPoller:
+    """
+    Polls Gmail for every connected user with a shared pool of workers.
+
+    Users are kept in a due-time heap and re-scheduled with a jittered interval,
+    one Aiogoogle session and one discovery document are shared by all workers,
+    a global token bucket caps Gmail API calls and a per-user semaphore bounds
+    concurrent messages.get calls.
+
+    With push enabled, Gmail notifications queue a poll for their user right away
+    and the scheduled polls only run at a slow fallback interval.
+    """
+
+    def __init__(self, on_emails: EmailHandler = run_polling_graph):
+        self.on_emails = on_emails
+        self.interval = Config.GMAIL_PUSH_FALLBACK_INTERVAL if Config.GMAIL_PUSH_ENABLED else Config.GMAIL_POLL_INTERVAL
+        self.rate_limiter = TokenBucket(rate=Config.GMAIL_API_RATE, capacity=Config.GMAIL_API_RATE)
+
+        self._aiogoogle: Optional[Aiogoogle] = None
+        self._gmail = None
+        self._due: List[tuple] = []  # (due_at, username)
+        self._scheduled: Dict[str, Optional[float]] = {}  # due_at of the live heap entry, None while its poll runs
+        self._users: Dict[str, dict] = {}
+        self._by_address: Dict[str, str] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._pushed: set = set()  # users with a push-triggered poll queued
+        self._queue: asyncio.Queue = None
+        self._tasks: List[asyncio.Task] = []
+
+        self.polls = 0
+        self.errors = 0
+        self.emails_fetched = 0
+        self.push_received = 0
+        self.push_polls = 0
+        self.push_skipped = 0
+        self.push_dropped = 0
+        self._recent_polls = deque(maxlen=10000)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        """Open the shared session, load the Gmail API once and start the workers."""
+        self._aiogoogle = Aiogoogle(client_creds=get_client_creds())
+        await self._aiogoogle.__aenter__()
+        self._gmail = await discovery_cache.get('gmail', 'v1')
+        self._queue = asyncio.Queue(maxsize=Config.GMAIL_POLL_WORKERS * 4)
+
+        # tasks inherit the context holding the open session
+        self._tasks = [
+            asyncio.create_task(self._refresh_roster_loop()),
+            asyncio.create_task(self._scheduler()),
+            *(asyncio.create_task(self._worker()) for _ in range(Config.GMAIL_POLL_WORKERS))
+        ]
+        logger.info(f"Gmail poller started with {Config.GMAIL_POLL_WORKERS} workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        if self._aiogoogle:
+            await self._aiogoogle.__aexit__(None, None, None)
+            self._aiogoogle = None
+        await gmail_batch.aclose()
+
+    def _schedule(self, username: str, delay: float):
+        jitter = delay * Config.GMAIL_POLL_JITTER
+        due_at = time.monotonic() + delay + random.uniform(-jitter, jitter)
+        self._scheduled[username] = due_at
+        heapq.heappush(self._due, (due_at, username))
+
+    def _pop_due(self, now: float) -> List[str]:
+        """Pop the users due by now, dropping stale heap entries and users that left."""
+        due = []
+        while self._due and self._due[0][0] <= now:
+            due_at, username = heapq.heappop(self._due)
+            if self._scheduled.get(username) != due_at:
+                continue
+            if username in self._users:
+                self._scheduled[username] = None
+                due.append(username)
+            else:
+                del self._scheduled[username]
+        return due
+
+    async def _refresh_roster_loop(self):
+        while True:
+            try:
+                await self.refresh_roster()
+            except Exception as e:
+                logger.error(f"Failed to refresh Gmail poller roster: {e}")
+            await asyncio.sleep(Config.GMAIL_ROSTER_REFRESH)
+
+    async def refresh_roster(self):
+        """Pick up newly connected users and forget disconnected ones."""
+        cursor = mongo.db[COLLECTIONS['users']].find(
+            {"gmail_credentials": {"$exists": True}},
+            {"username": 1, "gmail_credentials": 1, "gmail_history_id": 1, "gmail_address": 1, "gmail_watch_expiration": 1}
+        )
+        users = {user["username"]: user async for user in cursor}
+
+        for username in users.keys() - self._users.keys():
+            if username in self._scheduled:
+                # removed and re-added before its old entry came up, that entry still polls it
+                continue
+            # spread first polls over one interval instead of a thundering herd
+            self._schedule(username, random.uniform(0, min(self.interval, Config.GMAIL_POLL_INTERVAL)))
+        for username in self._users.keys() - users.keys():
+            self._semaphores.pop(username, None)
+            self._locks.pop(username, None)
+
+        self._users = users
+        self._by_address = {
+            user["gmail_address"].lower(): username
+            for username, user in users.items() if user.get("gmail_address")
+        }
+
+    def notify(self, email_address: str, history_id: int) -> bool:
+        """
+        Handle a Gmail push notification. Returns False for unknown mailboxes.
+        Notifications at or below the stored history id are dropped, repeated ones
+        for a user whose poll is still queued are coalesced into that poll.
+        """
+        username = self._by_address.get(email_address.lower())
+        if username is None:
+            return False
+
+        self.push_received += 1
+        stored = self._users[username].get("gmail_history_id")
+        if stored and history_id <= int(stored):
+            self.push_skipped += 1
+            return True
+        if username in self._pushed:
+            self.push_skipped += 1
+            return True
+
+        try:
+            self._queue.put_nowait((username, False))
+            self._pushed.add(username)
+        except asyncio.QueueFull:
+            # the fallback poll will pick the changes up
+            self.push_dropped += 1
+        return True
+
+    async def _scheduler(self):
+        while True:
+            now = time.monotonic()
+            for username in self._pop_due(now):
+                await self._queue.put((username, True))
+
+            next_due = self._due[0][0] - now if self._due else 1.0
+            await asyncio.sleep(min(max(next_due, 0.05), 1.0))
+
+    async def _worker(self):
+        while True:
+            username, scheduled = await self._queue.get()
+            try:
+                # one poll per user at a time, a queued poll then starts from the new history id
+                async with self._locks.setdefault(username, asyncio.Lock()):
+                    if not scheduled:
+                        self._pushed.discard(username)
+                        self.push_polls += 1
+                    user = self._users.get(username)
+                    if user:
+                        await self.poll_user(user)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Gmail poll failed for {username}: {e}")
+            finally:
+                self._queue.task_done()
+                if scheduled:
+                    if username in self._users:
+                        self._schedule(username, self.interval)
+                    else:
+                        self._scheduled.pop(username, None)
+
+    async def poll_user(self, user: dict):
+        """Fetch new emails for one user and hand them to the handler."""
+        username = user["username"]
+        creds = await self._fresh_creds(user)
+        semaphore = self._semaphores.setdefault(username, asyncio.Semaphore(Config.GMAIL_PER_USER_CONCURRENCY))
+
+        if Config.GMAIL_PUSH_ENABLED and Config.GMAIL_PUSH_TOPIC and self._watch_due(user):
+            await self.watch_user(user, creds)
+
+        history_id = user.get("gmail_history_id")
+        emails, new_history_id = await fetch_new_emails(
+            self._aiogoogle, self._gmail, creds, history_id, semaphore, self.rate_limiter
+        )
+
+        self.polls += 1
+        self._recent_polls.append(time.monotonic())
+
+        if emails:
+            self.emails_fetched += len(emails)
+            await self.on_emails(user, emails)
+            await mark_messages_as_processed([email_obj['id'] for email_obj in emails])
+
+        # only advance once the emails are handled, so a failed poll is retried from the same point
+        if new_history_id != history_id:
+            user["gmail_history_id"] = new_history_id
+            await save_history_id(username, new_history_id)
+
+    def _watch_due(self, user: dict) -> bool:
+        # watches expire after 7 days, renew them a day early
+        expiration_ms = int(user.get("gmail_watch_expiration") or 0)
+        return expiration_ms - time.time() * 1000 < 24 * 3600 * 1000
+
+    async def watch_user(self, user: dict, creds: dict):
+        """Ask Gmail to publish the user's inbox changes to GMAIL_PUSH_TOPIC."""
+        if self.rate_limiter:
+            await self.rate_limiter.acquire()
+        response = await self._aiogoogle.as_user(
+            self._gmail.users.watch(userId='me', json={
+                "topicName": Config.GMAIL_PUSH_TOPIC,
+                "labelIds": ["INBOX"],
+                "labelFilterBehavior": "include"
+            }),
+            user_creds=creds
+        )
+        user["gmail_watch_expiration"] = response.get("expiration")
+        await mongo.db[COLLECTIONS['users']].update_one(
+            {"username": user["username"]},
+            {"$set": {"gmail_watch_expiration": user["gmail_watch_expiration"]}}
+        )
+
+    async def _fresh_creds(self, user: dict) -> dict:
+        """Refresh expired credentials once and persist them, instead of on every request."""
+        is_refreshed, creds = await self._aiogoogle.oauth2.refresh(
+            user["gmail_credentials"], client_creds=self._aiogoogle.client_creds
+        )
+        if is_refreshed:
+            user["gmail_credentials"] = creds
+            await mongo.db[COLLECTIONS['users']].update_one(
+                {"username": user["username"]},
+                {"$set": {"gmail_credentials": creds, "auth_updated_at": datetime.now()}}
+            )
+        return creds
+
+    def stats(self) -> Dict[str, float]:
+        now = time.monotonic()
+        last_minute = sum(1 for t in self._recent_polls if now - t <= 60)
+        return {
+            "users": len(self._users),
+            "queued": self._queue.qsize() if self._queue else 0,
+            "polls": self.polls,
+            "errors": self.errors,
+            "emails_fetched": self.emails_fetched,
+            "users_per_second": last_minute / 60,
+            "push": {
+                "received": self.push_received,
+                "polls": self.push_polls,
+                "skipped": self.push_skipped,
+                "dropped": self.push_dropped,
+            },
+            "batch": gmail_batch.stats(),
+            "dedup": dedup_stats(),
+        }
+
+
+# Global instance
+gmail_poller = GmailPoller()
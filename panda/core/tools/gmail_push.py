@@ -0,0 +1,52 @@
+import json
+import base64
+import uuid
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+import httpx
+
+
+def decode_notification(envelope: dict) -> Tuple[str, int]:
+    """
+    Extract (email address, history id) from a Pub/Sub push envelope:
+    {"message": {"data": base64({"emailAddress": ..., "historyId": ...}), ...}, "subscription": ...}
+    """
+    data = envelope["message"]["data"]
+    payload = json.loads(base64.b64decode(data + "=" * (-len(data) % 4)))
+    return payload["emailAddress"].lower(), int(payload["historyId"])
+
+
+def encode_notification(email_address: str, history_id: int, subscription: str = "projects/local/subscriptions/gmail") -> dict:
+    """Build the push envelope Pub/Sub sends for a Gmail mailbox change."""
+    data = json.dumps({"emailAddress": email_address, "historyId": history_id}).encode()
+    return {
+        "message": {
+            "data": base64.b64encode(data).decode(),
+            "messageId": uuid.uuid4().hex,
+            "publishTime": datetime.now(timezone.utc).isoformat(),
+        },
+        "subscription": subscription,
+    }
+
+
+class FakePubSubPublisher:
+    """
+    Local stand-in for Gmail's Pub/Sub topic: posts push envelopes to the webhook,
+    either over HTTP (url) or in-process against the ASGI app (app).
+    """
+
+    def __init__(self, url: str = "http://localhost:8000/gmail/push", app=None, token: Optional[str] = None):
+        self.url = url
+        self.token = token
+        transport = httpx.ASGITransport(app=app) if app is not None else None
+        self._client = httpx.AsyncClient(transport=transport, timeout=10.0)
+
+    async def publish(self, email_address: str, history_id: int) -> int:
+        """Send one notification, returns the webhook's status code."""
+        params = {"token": self.token} if self.token else None
+        response = await self._client.post(self.url, json=encode_notification(email_address, history_id), params=params)
+        return response.status_code
+
+    async def aclose(self):
+        await self._client.aclose()
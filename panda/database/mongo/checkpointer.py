@@ -0,0 +1,234 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from pymongo import UpdateOne
+
+from panda import Config
+from panda.database.mongo.connection import mongo, COLLECTIONS
+
+logger = logging.getLogger(__name__)
+
+
+class MongoCheckpointSaver(BaseCheckpointSaver):
+    """
+    LangGraph checkpoint saver backed by the shared Motor connection.
+
+    Each checkpoint is stored as one document holding the serialized checkpoint
+    (channel values included), so resuming a conversation is a single indexed
+    lookup of the latest document. Once per turn, older checkpoints beyond the
+    last CHECKPOINT_KEEP_LAST are dropped, and a TTL index expires idle conversations.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # (thread_id, checkpoint_ns) being pruned, and the prune tasks the loop only holds weakly
+        self._pruning: Set[Tuple[str, str]] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def _checkpoints(self):
+        return mongo.db[COLLECTIONS['checkpoints']]
+
+    @property
+    def _writes(self):
+        return mongo.db[COLLECTIONS['checkpoint_writes']]
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        query = {"conversation_id": thread_id, "checkpoint_ns": checkpoint_ns}
+
+        if checkpoint_id := get_checkpoint_id(config):
+            query["checkpoint_id"] = checkpoint_id
+
+        doc = await self._checkpoints.find_one(query, sort=[("checkpoint_id", -1)])
+        if not doc:
+            return None
+        return await self._load_tuple(doc)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        query: Dict[str, Any] = {}
+        if config:
+            query["conversation_id"] = config["configurable"]["thread_id"]
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                query["checkpoint_ns"] = checkpoint_ns
+            if checkpoint_id := get_checkpoint_id(config):
+                query["checkpoint_id"] = checkpoint_id
+        if before and (before_id := get_checkpoint_id(before)):
+            query["checkpoint_id"] = {"$lt": before_id}
+
+        async for doc in self._checkpoints.find(query).sort("checkpoint_id", -1):
+            # metadata is stored serialized, so the filter is applied after loading
+            if filter:
+                metadata = self.serde.loads_typed((doc["metadata_type"], doc["metadata"]))
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+
+            yield await self._load_tuple(doc)
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        await self._checkpoints.update_one(
+            {"conversation_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]},
+            {
+                "$set": {
+                    "parent_checkpoint_id": config["configurable"].get("checkpoint_id"),
+                    "type": checkpoint_type,
+                    "checkpoint": checkpoint_blob,
+                    "metadata_type": metadata_type,
+                    "metadata": metadata_blob,
+                    "updated_at": datetime.utcnow()
+                }
+            },
+            upsert=True
+        )
+
+        # compaction is off the hot path, once per turn at the checkpoint of the turn's input
+        if metadata.get("source") == "input" and (thread_id, checkpoint_ns) not in self._pruning:
+            self._pruning.add((thread_id, checkpoint_ns))
+            task = asyncio.create_task(self._prune(thread_id, checkpoint_ns))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        operations = []
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            value_type, value_blob = self.serde.dumps_typed(value)
+            doc = {
+                "channel": channel,
+                "type": value_type,
+                "value": value_blob,
+                "task_path": task_path,
+                "updated_at": datetime.utcnow()
+            }
+            key = {
+                "conversation_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id,
+                "task_id": task_id,
+                "idx": write_idx,
+            }
+            # special writes (errors, interrupts) overwrite, regular writes are first-wins
+            update = {"$set": doc} if write_idx < 0 else {"$setOnInsert": doc}
+            operations.append(UpdateOne(key, update, upsert=True))
+
+        if operations:
+            await self._writes.bulk_write(operations, ordered=False)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self._checkpoints.delete_many({"conversation_id": thread_id})
+        await self._writes.delete_many({"conversation_id": thread_id})
+
+    async def _load_tuple(self, doc: Dict[str, Any]) -> CheckpointTuple:
+        thread_id = doc["conversation_id"]
+        checkpoint_ns = doc["checkpoint_ns"]
+        checkpoint_id = doc["checkpoint_id"]
+
+        pending_writes = []
+        cursor = self._writes.find(
+            {"conversation_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}
+        ).sort([("task_id", 1), ("idx", 1)])
+        async for write in cursor:
+            pending_writes.append(
+                (write["task_id"], write["channel"], self.serde.loads_typed((write["type"], write["value"])))
+            )
+
+        parent_id = doc.get("parent_checkpoint_id")
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed((doc["type"], doc["checkpoint"])),
+            metadata=self.serde.loads_typed((doc["metadata_type"], doc["metadata"])),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=pending_writes,
+        )
+
+    async def _prune(self, thread_id: str, checkpoint_ns: str):
+        """Drop all but the newest CHECKPOINT_KEEP_LAST checkpoints of a conversation."""
+        try:
+            query = {"conversation_id": thread_id, "checkpoint_ns": checkpoint_ns}
+            cursor = self._checkpoints.find(query, {"checkpoint_id": 1}).sort("checkpoint_id", -1)
+            kept = await cursor.skip(Config.CHECKPOINT_KEEP_LAST - 1).limit(1).to_list(1)
+            if not kept:
+                return
+
+            stale = {**query, "checkpoint_id": {"$lt": kept[0]["checkpoint_id"]}}
+            await self._checkpoints.delete_many(stale)
+            await self._writes.delete_many(stale)
+        except Exception as e:
+            logger.error(f"Failed to prune checkpoints for {thread_id}: {e}")
+        finally:
+            self._pruning.discard((thread_id, checkpoint_ns))
+
+
+# Global instance
+mongo_checkpointer = MongoCheckpointSaver()
@@ -6,7 +6,12 @@ from panda import Config
 COLLECTIONS = {
     'users': 'users',
     'processed_emails': 'processed_emails',
-    'settings': 'settings'
+    'settings': 'settings',
+    'response_cache': 'response_cache',
+    'checkpoints': 'checkpoints',
+    'checkpoint_writes': 'checkpoint_writes',
+    'agent_routes': 'agent_routes',
+    'sender_reputation': 'sender_reputation'
 }
 
 class Database:
@@ -34,6 +39,27 @@ class Database:
             [("email_id", 1)], 
             unique=True
         )
+        await self.db[COLLECTIONS['response_cache']].create_index(
+            [("created_at", 1)],
+            expireAfterSeconds=int(Config.RESPONSE_CACHE_TTL)
+        )
+        await self.db[COLLECTIONS['checkpoints']].create_index(
+            [("conversation_id", 1), ("checkpoint_id", -1), ("checkpoint_ns", 1)],
+            unique=True
+        )
+        await self.db[COLLECTIONS['checkpoint_writes']].create_index(
+            [("conversation_id", 1), ("checkpoint_id", -1), ("checkpoint_ns", 1), ("task_id", 1), ("idx", 1)],
+            unique=True
+        )
+        await self.db[COLLECTIONS['sender_reputation']].create_index(
+            [("user_id", 1), ("sender", 1)],
+            unique=True
+        )
+        for name in ('checkpoints', 'checkpoint_writes'):
+            await self.db[COLLECTIONS[name]].create_index(
+                [("updated_at", 1)],
+                expireAfterSeconds=Config.CHECKPOINT_TTL
+            )
 
 
 mongo = Database()
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import Literal, Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field
 
 
@@ -13,6 +13,14 @@ class SupervisorRouterResponse(BaseModel):
         "human_review",
         "END"
     ]] = Field(default=None, description="The label / key of next agent to route to (label only)")
+    parallel_agents: List[Literal[
+        "email_agent",
+        "scheduler_agent",
+        "chitchat_agent"
+    ]] = Field(
+        default_factory=list,
+        description="Other agents to run at the same time as next_agent, only for independent tasks of the same request"
+    )
     #reasoning: str = Field(description="Why this routing decision was made")
     #urgency: Literal["low", "medium", "high"] = Field(default="medium")
 
@@ -39,6 +47,16 @@ class EmailAgentResponse(BaseModel):
     )
 
 
+class EmailDecision(EmailAgentResponse):
+    """Email agent decision for one email of a batch"""
+    email_id: str = Field(description="The 'Email ID' of the email this decision is about, copied exactly")
+
+
+class EmailBatchResponse(BaseModel):
+    """Email agent decisions for a batch of polled emails"""
+    decisions: List[EmailDecision] = Field(description="Exactly one decision per email in the batch")
+
+
 class SchedulerAgentResponse(BaseModel):
     """Scheduler agent actions"""
     action: Literal[
@@ -2,23 +2,58 @@ from typing import TypedDict, Annotated, Literal, Optional
 from datetime import datetime
 import operator
 
+
+def append_trace(left: list, right: list) -> list:
+    """Append route trace entries, keeping only the most recent ones"""
+    return ((left or []) + (right or []))[-200:]
+
+
+def last_value(left, right):
+    """Keep the latest write, also when parallel branches write the key in the same step"""
+    return right
+
+
+def merge_dict(left: Optional[dict], right: Optional[dict]) -> Optional[dict]:
+    """Merge dict updates key by key, so parallel branches don't overwrite each other"""
+    if right is None:
+        return left
+    return {**(left or {}), **right}
+
+
+class ReplaceActions(list):
+    """pending_actions update that replaces the list instead of appending to it"""
+
+
+class ResolvedActions(list):
+    """pending_actions update removing the actions a node has handled"""
+
+
+def update_actions(left: Optional[list], right: list) -> list:
+    """Append new pending actions, or apply a ReplaceActions / ResolvedActions update"""
+    if isinstance(right, ReplaceActions):
+        return list(right)
+    if isinstance(right, ResolvedActions):
+        return [action for action in left or [] if action not in right]
+    return (left or []) + (right or [])
+
+
 class MasterStateRequired(TypedDict):
     messages: Annotated[list, operator.add]
-    current_agent: str
+    current_agent: Annotated[str, last_value]
     user_id: str
     conversation_id: str
     timestamp: datetime
 
 
 class MasterState(MasterStateRequired, total=False):
-    next_agent: Optional[str]
+    next_agent: Annotated[Optional[str], last_value]
 
     # Context and actions
-    context: dict
-    pending_actions: Annotated[list, operator.add]
+    context: Annotated[dict, merge_dict]
+    pending_actions: Annotated[list, update_actions]
 
     # Human in loop
-    requires_human: bool
+    requires_human: Annotated[bool, last_value]
     human_feedback: Optional[str]
 
     # Health monitoring
@@ -27,13 +62,21 @@ class MasterState(MasterStateRequired, total=False):
     stress_level: float
 
     # Agent-specific data
-    email_data: Optional[dict]
-    scheduler_data: Optional[dict]
-    booking_data: Optional[dict]
+    email_data: Annotated[Optional[dict], merge_dict]
+    scheduler_data: Annotated[Optional[dict], merge_dict]
+    booking_data: Annotated[Optional[dict], merge_dict]
 
     # Metadata
     session_metadata: dict
 
+    # Loop guard
+    run_id: str
+    route_trace: Annotated[list, append_trace]
+    step_budget_exhausted: Annotated[bool, last_value]
+
+    # Agents running as parallel branches of the current step, set by the supervisor
+    fanout: Optional[list]
+
 
 class EmailState(TypedDict):
     """Email agent specific state"""
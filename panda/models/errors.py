@@ -2,4 +2,13 @@ class LLMFailure(Exception):
     pass
 
 class InvalidAPIKey(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class QueueFull(Exception):
+    pass
+
+class RateLimited(Exception):
+    pass
+
+class BackendUnavailable(Exception):
+    pass
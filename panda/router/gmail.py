@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Request, HTTPException
+from fastapi import APIRouter, Request, HTTPException, Response
 from aiogoogle import Aiogoogle
 from datetime import datetime
 
 from panda import Config
 from panda.core.tools.gmail import SCOPES, get_client_creds
+from panda.core.tools.gmail_discovery import discovery_cache
+from panda.core.tools.gmail_push import decode_notification
+from panda.core.tools.gmail_poller import gmail_poller
 from panda.database.mongo.connection import mongo, COLLECTIONS
 
 gmail_router = APIRouter()
@@ -50,12 +53,21 @@ async def callback(request: Request):
             grant=code,
             client_creds=CLIENT_CREDS,
         )
+
+        gmail = await discovery_cache.get('gmail', 'v1')
+        async with aiogoogle:
+            profile = await aiogoogle.as_user(
+                gmail.users.getProfile(userId='me'),
+                user_creds=user_creds
+            )
         
         await mongo.db[COLLECTIONS['users']].update_one(
             {"username": "test_user"}, 
             {
                 "$set": {
                     "gmail_credentials": user_creds,
+                    "gmail_address": profile.get("emailAddress"),
+                    "gmail_history_id": profile.get("historyId"),
                     "auth_updated_at": datetime.now()
                 }
             },
@@ -65,4 +77,29 @@ async def callback(request: Request):
         return {"message": "Authentication successful! Credentials saved for test_user."}
 
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Auth flow failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=f"Auth flow failed: {str(e)}")
+
+
+@gmail_router.post("/gmail/push")
+async def push_notification(request: Request):
+    """
+    Receives Gmail Pub/Sub push notifications and queues a poll for the mailbox's user.
+    Always acknowledges malformed or unknown notifications so Pub/Sub doesn't redeliver them.
+    """
+    if not Config.GMAIL_PUSH_ENABLED:
+        raise HTTPException(status_code=404, detail="Push notifications are disabled")
+    if Config.GMAIL_PUSH_TOKEN and request.query_params.get("token") != Config.GMAIL_PUSH_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid push token")
+    if not gmail_poller.running:
+        # not acknowledged, Pub/Sub retries once the poller is up
+        raise HTTPException(status_code=503, detail="Gmail poller is not running")
+
+    try:
+        email_address, history_id = decode_notification(await request.json())
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"Ignoring malformed Gmail push notification: {e}")
+        return Response(status_code=204)
+
+    if not gmail_poller.notify(email_address, history_id):
+        print(f"Gmail push notification for unknown mailbox {email_address}")
+    return Response(status_code=204)
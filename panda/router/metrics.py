@@ -0,0 +1,125 @@
+from fastapi import APIRouter
+
+from panda.agents.registry import graph_registry
+from panda.agents.prerouter import pre_router
+from panda.agents.history import history_stats
+from panda.agents.triage import email_triage
+from panda.agents.speculation import speculator
+from panda.core.llm.client_pool import client_registry
+from panda.core.llm.response_cache import response_cache
+from panda.core.llm.routing import llm_health
+from panda.core.llm.rate_limiter import llm_rate_limits
+from panda.core.concurrency import chat_admission, provider_limiter, cpu_pool, loop_lag
+from panda.core.tools.gmail_poller import gmail_poller
+from panda.core.tools.gmail_discovery import discovery_cache
+
+
+metrics_router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+)
+
+
+@metrics_router.get("/graphs")
+async def get_graph_metrics():
+    """
+    Get compile timings for the cached agent graphs.
+    """
+    return graph_registry.stats()
+
+
+@metrics_router.get("/llm-clients")
+async def get_llm_client_metrics():
+    """
+    Get pooled LLM client usage.
+    """
+    return client_registry.stats()
+
+
+@metrics_router.get("/llm-backends")
+async def get_llm_backend_metrics():
+    """
+    Get per provider/model circuit breaker state, failures, latency and hedging.
+    """
+    return llm_health.stats()
+
+
+@metrics_router.get("/llm-rate-limits")
+async def get_llm_rate_limit_metrics():
+    """
+    Get learned request/token limits, pauses and queued calls per provider/model.
+    """
+    return llm_rate_limits.stats()
+
+
+@metrics_router.get("/router")
+async def get_router_metrics():
+    """
+    Get pre-router hit rate and agreement with the supervisor LLM.
+    """
+    return pre_router.stats()
+
+
+@metrics_router.get("/response-cache")
+async def get_response_cache_metrics():
+    """
+    Get response cache size and hit/miss counters.
+    """
+    return response_cache.stats()
+
+
+@metrics_router.get("/concurrency")
+async def get_concurrency_metrics():
+    """
+    Get chat queue depth, wait times and per-provider LLM call slots.
+    """
+    return {
+        "chat": chat_admission.stats(),
+        "providers": provider_limiter.stats(),
+    }
+
+
+@metrics_router.get("/history")
+async def get_history_metrics():
+    """
+    Get prompt history tokens per agent call before and after trimming.
+    """
+    return history_stats()
+
+
+@metrics_router.get("/gmail-poller")
+async def get_gmail_poller_metrics():
+    """
+    Get Gmail poller throughput, queue depth and error counts.
+    """
+    return {
+        **gmail_poller.stats(),
+        "discovery": discovery_cache.stats(),
+    }
+
+
+@metrics_router.get("/event-loop")
+async def get_event_loop_metrics():
+    """
+    Get event-loop lag and CPU pool usage.
+    """
+    return {
+        "lag": loop_lag.stats(),
+        "cpu_pool": cpu_pool.stats(),
+    }
+
+
+@metrics_router.get("/triage")
+async def get_triage_metrics():
+    """
+    Get emails ignored by triage and email agent LLM calls avoided.
+    """
+    return email_triage.stats()
+
+
+@metrics_router.get("/speculation")
+async def get_speculation_metrics():
+    """
+    Get speculative agent runs, hit rate and tokens wasted on discarded runs.
+    """
+    return speculator.stats()
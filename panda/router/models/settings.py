@@ -1,12 +1,25 @@
 from pydantic import BaseModel, Field
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from panda.models.llm import LLMProvider
 
+class FallbackConfigModel(BaseModel):
+    provider: LLMProvider
+    model_name: str
+    temperature: Optional[float] = Field(None, ge=0.0, le=1.0)
+
 class AgentConfigModel(BaseModel):
     provider: LLMProvider
     model_name: str
     temperature: float = Field(0.7, ge=0.0, le=1.0)
+    # tried in order when the primary model fails or its circuit breaker is open
+    fallbacks: List[FallbackConfigModel] = []
 
 class SettingsUpdateModel(BaseModel):
     # Map agent name to its config
     agent_configs: Dict[str, AgentConfigModel]
+
+class TriageSettingsModel(BaseModel):
+    enabled: bool = True
+    threshold: float = Field(0.9, gt=0.0, le=1.0)
+    allow_senders: List[str] = []
+    block_senders: List[str] = []
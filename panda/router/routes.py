@@ -1,28 +1,52 @@
+import json
+import uuid
 import asyncio
+from typing import AsyncIterator, Optional
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from langchain_core.utils.json import parse_partial_json
 
 from ..core.llm.factory import LLMProvider, LLMFactory
 
 from datetime import datetime
 from langchain_core.messages import HumanMessage
 
-from panda.agents.graph import create_agent_graph, create_polling_graph
-from panda.models.agents.state import MasterState
+from panda import Config
+from panda.agents.registry import graph_registry
+from panda.agents.loop_guard import record_route
+from panda.models.agents.state import MasterState, ReplaceActions
+from panda.router.models import ChatMessage
+from panda.core.concurrency import chat_admission
+from panda.models.errors import QueueFull
 
 #from panda.agents.graph import build_and_run_graph
 
 router = APIRouter()
 
 
+# Structured output field streamed to the client as text, per agent node
+STREAMED_TEXT_FIELDS = {
+    "chitchat_agent": "response_text",
+    "email_agent": "draft_reply",
+}
+
+
 class PersonalAssistant:
     """Main personal assistant orchestrator"""
     
     def __init__(self, user_id: str):
         self.user_id = user_id
-        self.graph = create_agent_graph()
-        self.polling_graph = create_polling_graph()
         self.polling_task = None
+
+    @property
+    def graph(self):
+        return graph_registry.get("agent")
+
+    @property
+    def polling_graph(self):
+        return graph_registry.get("polling")
     
     async def chat(self, message: str, conversation_id: str = None) -> dict:
         """
@@ -35,57 +59,123 @@ class PersonalAssistant:
         Returns:
             Response dict with agent outputs
         """
+        conversation_id = conversation_id or f"conv_{datetime.now().timestamp()}"
+        initial_state = self._initial_state(message, conversation_id)
+        
+        # Run the graph
+        result = await self.graph.ainvoke(initial_state, self._thread_config(conversation_id))
+        record_route(result)
+        
+        # Extract response
+        return self._format_response(result, conversation_id)
+
+    async def stream(self, message: str, conversation_id: str = None) -> AsyncIterator[dict]:
+        """
+        Streaming chat interface
+        
+        Yields events as the graph runs:
+            {"type": "node", "node": ...} when an agent node starts
+            {"type": "token", "node": ..., "content": ...} for streamed reply text
+            {"type": "done", ...} with the same payload as chat()
+        """
+        conversation_id = conversation_id or f"conv_{datetime.now().timestamp()}"
+        initial_state = self._initial_state(message, conversation_id)
+        # run_id -> (raw structured output so far, text already sent)
+        buffers = {}
+        final_state = None
+
+        async for event in self.graph.astream_events(initial_state, self._thread_config(conversation_id), version="v2"):
+            kind = event["event"]
+            node = event.get("metadata", {}).get("langgraph_node")
+
+            if kind == "on_chain_start" and node and event["name"] == node:
+                yield {"type": "node", "node": node}
+
+            elif kind == "on_chat_model_stream" and node in STREAMED_TEXT_FIELDS:
+                chunk = event["data"]["chunk"]
+                raw, sent = buffers.get(event["run_id"], ("", ""))
+                raw += chunk.content if isinstance(chunk.content, str) else ""
+                raw += "".join(c.get("args") or "" for c in getattr(chunk, "tool_call_chunks", []))
+
+                # structured outputs arrive as partial JSON, only forward the new part of the text field
+                parsed = parse_partial_json(raw) if raw.lstrip().startswith("{") else None
+                text = (parsed or {}).get(STREAMED_TEXT_FIELDS[node]) or ""
+                if isinstance(text, str) and len(text) > len(sent):
+                    yield {"type": "token", "node": node, "content": text[len(sent):]}
+                    sent = text
+                buffers[event["run_id"]] = (raw, sent)
+
+            elif kind == "on_chain_end" and event["name"] == "LangGraph":
+                final_state = event["data"].get("output")
+
+        if final_state:
+            record_route(final_state)
+        yield {"type": "done", **self._format_response(final_state or {}, conversation_id)}
+
+    def _thread_config(self, conversation_id: str) -> dict:
+        """Run config selecting the conversation's checkpoint thread, scoped to the user"""
+        return {"configurable": {"thread_id": f"{self.user_id}:{conversation_id}", "user_id": self.user_id}}
+
+    def _initial_state(self, message: str, conversation_id: str) -> MasterState:
+        """
+        Build the graph input for a chat turn
+        
+        Only per-turn fields are set. Long-lived fields (context, agent data,
+        emotion state) are left out so a checkpointed conversation keeps them,
+        nodes fall back to empty defaults on the first turn.
+        """
         
         # Initialize state
         initial_state: MasterState = {
             "messages": [HumanMessage(content=message)],
             "current_agent": "supervisor",
-            "next_step": "",
+            "next_agent": None,
             "user_id": self.user_id,
-            "conversation_id": conversation_id or f"conv_{datetime.now().timestamp()}",
-            "context": {},
-            "pending_actions": [],
+            "conversation_id": conversation_id,
             "requires_human": False,
             "human_feedback": None,
-            "interaction_history": [],
-            "emotion_state": {},
-            "stress_level": 0.0,
-            "email_data": {},
-            "scheduler_data": {},
-            "booking_data": {},
             "timestamp": datetime.now(),
-            "session_metadata": {}
+            "run_id": uuid.uuid4().hex,
+            "step_budget_exhausted": False,
+            "pending_actions": ReplaceActions()
         }
         
-        # Run the graph
-        result = await self.graph.ainvoke(initial_state)
-        
-        # Extract response
-        return self._format_response(result)
+        return initial_state
     
-    def _format_response(self, state: dict) -> dict:
+    def _format_response(self, state: dict, conversation_id: str = None) -> dict:
         """Format the final state into a user-friendly response"""
         
         messages = state.get("messages", [])
-        ai_messages = [m.content for m in messages if hasattr(m, 'content') and m.content]
+
+        # only report what this turn produced, earlier turns live in the checkpoint
+        turn_start = 0
+        for i, m in enumerate(messages):
+            if isinstance(m, HumanMessage):
+                turn_start = i + 1
+        ai_messages = [m.content for m in messages[turn_start:] if hasattr(m, 'content') and m.content]
         
         response = {
             "response": "\n".join(ai_messages[-3:]),  # Last 3 messages
             "agent": state.get("current_agent"),
+            "conversation_id": conversation_id,
             "requires_action": state.get("requires_human", False),
+            "budget_exhausted": state.get("step_budget_exhausted", False),
             "emotion_state": state.get("emotion_state", {}),
             "pending_actions": state.get("pending_actions", [])
         }
         
         return response
     
-    async def start_polling(self, interval_seconds: int = 300):
+    async def start_polling(self, interval_seconds: int = None):
         """
         Start automated email polling
         
         Args:
-            interval_seconds: Polling interval (default: 5 minutes)
+            interval_seconds: Polling interval (default: 5 minutes, or the slow
+                fallback interval when Gmail push notifications are enabled)
         """
+        if interval_seconds is None:
+            interval_seconds = Config.GMAIL_PUSH_FALLBACK_INTERVAL if Config.GMAIL_PUSH_ENABLED else 300
         
         async def poll_loop():
             while True:
@@ -109,7 +199,8 @@ class PersonalAssistant:
                         "scheduler_data": {},
                         "booking_data": {},
                         "timestamp": datetime.now(),
-                        "session_metadata": {}
+                        "session_metadata": {},
+                        "run_id": uuid.uuid4().hex
                     }
                     
                     result = await self.polling_graph.ainvoke(poll_state)
@@ -141,14 +232,133 @@ class PersonalAssistant:
         
         Use this when requires_action=True in response
         """
-        # This would continue the graph execution with human input
-        # Implementation depends on your state persistence strategy
-        pass
+        config = self._thread_config(conversation_id)
+        snapshot = await self.graph.aget_state(config)
+        
+        if "human_review" not in (snapshot.next or ()):
+            raise ValueError(f"Conversation {conversation_id} is not waiting for feedback")
+        
+        # Resume from the latest checkpoint instead of replaying the conversation
+        await self.graph.aupdate_state(config, {
+            "human_feedback": feedback,
+            "messages": [HumanMessage(content=feedback)],
+            "run_id": uuid.uuid4().hex,
+            "step_budget_exhausted": False,
+            "pending_actions": ReplaceActions()
+        })
+        result = await self.graph.ainvoke(None, config)
+        record_route(result)
+        
+        return self._format_response(result, conversation_id)
+
+
+
+
+
+
+def _too_busy(e: QueueFull) -> HTTPException:
+    return HTTPException(status_code=429, detail=f"Too many chats in flight: {e}", headers={"Retry-After": "1"})
+
+
+class _AdmittedStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse holding an admission slot taken before it was built.
+    The slot is released however the response ends, also when the client disconnects
+    before the body is iterated and the generator's finally never runs.
+    """
 
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            chat_admission.release()
 
 
+@router.post("/chat")
+async def chat(message: ChatMessage, user_id: str, conversation_id: Optional[str] = None):
+    """
+    Runs a chat turn under the global concurrency limit.
+    Rejected with 429 when the wait queue is full.
+    """
+    try:
+        async with chat_admission.slot():
+            assistant = PersonalAssistant(user_id=user_id)
+            return await assistant.chat(message.content, conversation_id)
+    except QueueFull as e:
+        raise _too_busy(e)
 
 
+@router.post("/chat/{conversation_id}/feedback")
+async def chat_feedback(conversation_id: str, message: ChatMessage, user_id: str):
+    """
+    Resumes a conversation paused for human review.
+    """
+    try:
+        async with chat_admission.slot():
+            assistant = PersonalAssistant(user_id=user_id)
+            return await assistant.provide_feedback(conversation_id, message.content)
+    except QueueFull as e:
+        raise _too_busy(e)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/chat/stream")
+async def chat_stream(message: ChatMessage, user_id: str, conversation_id: Optional[str] = None):
+    """
+    Streams a chat turn as Server-Sent Events.
+    """
+    # admit before the response starts so a full queue can still answer 429
+    try:
+        await chat_admission.acquire()
+    except QueueFull as e:
+        raise _too_busy(e)
+
+    assistant = PersonalAssistant(user_id=user_id)
+
+    async def event_source():
+        try:
+            async for event in assistant.stream(message.content, conversation_id):
+                yield f"event: {event['type']}\ndata: {json.dumps(jsonable_encoder(event))}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return _AdmittedStreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/chat/ws")
+async def chat_websocket(websocket: WebSocket, user_id: str):
+    """
+    Streams chat turns over a WebSocket.
+    Each client message is {"content": ..., "conversation_id": ...}, answered with a stream of events ending in "done".
+    """
+    await websocket.accept()
+    assistant = PersonalAssistant(user_id=user_id)
+
+    try:
+        while True:
+            payload = await websocket.receive_json()
+            content = payload.get("content")
+            if not content:
+                await websocket.send_json({"type": "error", "detail": "Missing content"})
+                continue
+
+            try:
+                async with chat_admission.slot():
+                    async for event in assistant.stream(content, payload.get("conversation_id")):
+                        await websocket.send_json(jsonable_encoder(event))
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+
+    except WebSocketDisconnect:
+        pass
+
 
 # TODO change response model
 @router.get("/testmodelflash")
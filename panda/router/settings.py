@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from panda.core.llm.config_manager import config_manager
-from panda.router.models.settings import SettingsUpdateModel
+from panda.router.models.settings import SettingsUpdateModel, TriageSettingsModel
+from panda.agents.triage import email_triage
 from panda.core.llm.llm_list import (
     MISTRAL_AI, CEREBRAS, GROQ, 
     OPENAI, GEMINI, ANTHROPIC, OPENROUTER, OLLAMA
@@ -54,3 +55,19 @@ async def update_agent_configs(settings: SettingsUpdateModel):
         return {"status": "success", "message": "Configuration updated successfully", "config": config_manager.get_all_configs()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update configuration: {str(e)}")
+
+
+@settings_router.get("/triage/{user_id}")
+async def get_triage_settings(user_id: str):
+    """
+    Get the email triage settings of a user.
+    """
+    return await email_triage.get_settings(user_id)
+
+
+@settings_router.put("/triage/{user_id}")
+async def update_triage_settings(user_id: str, settings: TriageSettingsModel):
+    """
+    Update the email triage settings of a user.
+    """
+    return await email_triage.update_settings(user_id, settings.model_dump())
@@ -0,0 +1,62 @@
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, Iterator, Optional, Tuple
+
+
+class LRUCache:
+    """Size bounded mapping with least-recently-used eviction and an optional TTL per entry."""
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+
+        expires_at, value = entry
+        if expires_at and expires_at < time.monotonic():
+            del self._data[key]
+            return default
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0.0
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return entry[1] if entry else default
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        """Iterate live entries without touching their recency."""
+        now = time.monotonic()
+        for key, (expires_at, value) in list(self._data.items()):
+            if not expires_at or expires_at >= now:
+                yield key, value
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def messages_digest(messages: Iterable[Any]) -> str:
+    """Short stable digest of chat messages (role and content), for cache keys."""
+    digest = hashlib.sha1()
+    for m in messages:
+        digest.update(f"{getattr(m, 'type', '')}\x1f{m.content}\x1e".encode("utf-8"))
+    return digest.hexdigest()[:16]
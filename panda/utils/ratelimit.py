@@ -0,0 +1,37 @@
+import time
+import asyncio
+
+
+class TokenBucket:
+    """
+    Async token bucket refilling `rate` tokens per second up to `capacity`.
+    Waiters are served in arrival order.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def set_rate(self, rate: float, capacity: float = None):
+        """Change the refill rate, keeping the tokens earned at the old rate"""
+        self._refill()
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = min(self._tokens, self.capacity)
+
+    async def acquire(self, tokens: float = 1.0):
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= min(tokens, self.capacity):
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((min(tokens, self.capacity) - self._tokens) / self.rate)
@@ -1,23 +1,129 @@
+import re
 import base64
+import binascii
+from functools import lru_cache
+from html.parser import HTMLParser
 from urlextract import URLExtract
 from urllib.parse import urlparse
 
-extractor = URLExtract()
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+# Tags whose text is never part of the readable body
+SKIPPED_TAGS = {"script", "style", "head", "title", "noscript"}
+
+
+def decode_base64url(data: str, max_chars: int = None) -> str:
+    """
+    Decode a base64url string, padding it if needed.
+    With max_chars, only the prefix needed for that many bytes is decoded.
+    """
+    if not data: return ""
+    if max_chars is not None:
+        # 4 base64 characters per 3 bytes, cut on a quantum boundary
+        data = data[:(max_chars + 2) // 3 * 4]
+    try:
+        raw = base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+    except (binascii.Error, ValueError):
+        return ""
+    # a cut can split a multi-byte character, drop it instead of failing
+    return raw.decode('utf-8', errors='ignore' if max_chars is not None else 'replace')
 
 
 def clean_text(data):
     """Decodes base64url encoded string."""
-    if not data: return ""
-    clean_data = data.replace("-", "+").replace("_", "/")
-    return base64.b64decode(clean_data).decode('utf-8')
+    return decode_base64url(data)
+
+
+class _TextCollector(HTMLParser):
+    """Collects text nodes outside of script/style blocks."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.chunks = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.chunks.append(data)
+
+
+def strip_html(html: str) -> str:
+    """Text content of an HTML document, words separated by spaces."""
+    if not html: return ""
+
+    if lxml is not None:
+        try:
+            root = lxml.html.fromstring(html)
+            for node in root.xpath("|".join(f"//{tag}" for tag in SKIPPED_TAGS)):
+                node.drop_tree()
+            return " ".join(root.xpath("//text()"))
+        except Exception:
+            pass  # fall back to the stdlib parser on documents lxml rejects
+
+    collector = _TextCollector()
+    collector.feed(html)
+    collector.close()
+    return " ".join(collector.chunks)
+
+
+def _factor_tld_pattern(pattern: re.Pattern) -> re.Pattern:
+    """
+    URLExtract matches TLDs with one huge `\\.com|\\.org|...` alternation that is tried at every
+    position of the text. Factoring out the leading dot lets the regex engine skip straight to
+    dots; alternatives keep their order, so the matches are the same.
+    """
+    alternatives = pattern.pattern.split("|")
+    dotted = [a[2:] for a in alternatives if a.startswith("\\.")]
+    others = [a for a in alternatives if not a.startswith("\\.")]
+    if not dotted or any(not a.startswith("\\.") for a in alternatives[:len(dotted)]):
+        return pattern  # unexpected layout, keep the original
+
+    factored = "\\.(?:" + "|".join(dotted) + ")" + "".join("|" + a for a in others)
+    return re.compile(factored, flags=pattern.flags)
+
+
+@lru_cache(maxsize=1)
+def get_url_extractor() -> URLExtract:
+    """
+    Shared URLExtract, built on first use since loading its TLD list is slow.
+    The TLD pattern is a private attribute, when a urlextract release drops it the stock extractor is used.
+    """
+    extractor = URLExtract()
+    tlds_re = getattr(extractor, "_tlds_re", None)
+    if isinstance(tlds_re, re.Pattern):
+        extractor._tlds_re = _factor_tld_pattern(tlds_re)
+    return extractor
+
+
+@lru_cache(maxsize=4096)
+def _link_placeholder(url: str) -> str:
+    return f"[LINK: {urlparse(url).netloc}]"
 
 
 def clean_urls(text: str) -> str:
-    urls = extractor.find_urls(text)
+    """Replace every URL with a [LINK: domain] placeholder in a single pass over the text."""
+    matches = get_url_extractor().find_urls(text, get_indices=True)
+    if not matches:
+        return text
 
-    for url in urls:
-        domain = urlparse(url).netloc
-        replacement = f"[LINK: {domain}]"
-        text = text.replace(url, replacement)
+    chunks, last = [], 0
+    for url, (start, end) in sorted(matches, key=lambda m: m[1][0]):
+        if start < last:
+            continue
+        chunks.append(text[last:start])
+        chunks.append(_link_placeholder(url))
+        last = end
+    chunks.append(text[last:])
 
-    return text
\ No newline at end of file
+    return "".join(chunks)
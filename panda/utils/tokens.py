@@ -0,0 +1,16 @@
+from typing import List
+
+from langchain_core.messages import BaseMessage
+
+
+# per-message overhead for role and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def count_tokens(messages: List[BaseMessage]) -> int:
+    """Cheap token estimate (~4 characters per token) used to size prompts before a call."""
+    total = 0
+    for m in messages:
+        content = m.content if isinstance(m.content, str) else str(m.content)
+        total += len(content) // 4 + MESSAGE_OVERHEAD_TOKENS
+    return total
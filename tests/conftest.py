@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Config is read at import time, so the test settings go in before panda is imported
+os.environ.setdefault("ENV", "test")
+os.environ.setdefault("DATABASE_URL", "mongodb://localhost:1")
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
+os.environ.setdefault("GEMINI_API", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
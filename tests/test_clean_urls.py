@@ -0,0 +1,107 @@
+import random
+from urllib.parse import urlparse
+
+import pytest
+from urlextract import URLExtract
+
+from panda.utils import text as text_utils
+from panda.utils.text import clean_urls, get_url_extractor
+
+_baseline_extractor = URLExtract()
+
+
+def _baseline_clean_urls(text: str) -> str:
+    """clean_urls before the single-pass rewrite: one str.replace per URL found"""
+    for url in _baseline_extractor.find_urls(text):
+        text = text.replace(url, f"[LINK: {urlparse(url).netloc}]")
+    return text
+
+
+def _has_prefix_urls(text: str) -> bool:
+    """True when a URL is a prefix of another, where the baseline's str.replace also rewrote the longer URL's head"""
+    urls = set(_baseline_extractor.find_urls(text))
+    return any(a != b and b.startswith(a) for a in urls for b in urls)
+
+
+def _corpus():
+    texts = [
+        "no links here",
+        "see https://ex.com/a and http://ex.com/a again https://ex.com/a",
+        "Visit www.google.com or google.com/maps, or (https://a.b.io/x?y=1).",
+        "Email me at bob@example.com",
+        "Unsubscribe: https://list.example.com/u?id=123&t=abc | View online https://example.com/v/1",
+        "Zoom https://zoom.us/j/123456?pwd=abc. Thanks!",
+        "",
+        "ex.com/1 ex.com/1 ex.com/1",
+    ]
+    rng = random.Random(1)
+    domains = ["shop.example.com", "t.co", "news.site.org", "cdn.mail.net", "bit.ly"]
+    for i in range(30):
+        words = [
+            rng.choice([
+                "word", "Deal!", "and",
+                f"https://{rng.choice(domains)}/p/{rng.randint(0, 10 ** 6)}?utm={i}",
+                f"{rng.choice(domains)}/x{rng.randint(0, 99)}",
+            ])
+            for _ in range(60)
+        ]
+        texts.append(" ".join(words))
+    return texts
+
+
+CORPUS = _corpus()
+
+
+def test_corpus_covers_prefix_urls():
+    assert len(CORPUS) == 38
+    assert any(_has_prefix_urls(text) for text in CORPUS)
+
+
+@pytest.mark.parametrize("text", [t for t in CORPUS if not _has_prefix_urls(t)])
+def test_matches_baseline(text):
+    assert clean_urls(text) == _baseline_clean_urls(text)
+
+
+@pytest.mark.parametrize("text", [t for t in CORPUS if _has_prefix_urls(t)])
+def test_prefix_urls_are_replaced_whole(text):
+    """The baseline left the tail of the longer URL behind ('[LINK: ]9'), every URL is now replaced whole"""
+    matches = _baseline_extractor.find_urls(text, get_indices=True)
+    expected, last = [], 0
+    for url, (start, end) in sorted(matches, key=lambda m: m[1][0]):
+        expected += [text[last:start], f"[LINK: {urlparse(url).netloc}]"]
+        last = end
+    expected.append(text[last:])
+
+    assert clean_urls(text) == "".join(expected)
+
+
+def test_prefix_url_example():
+    text = "old https://bit.ly/x1 new https://bit.ly/x19 done"
+
+    assert _baseline_clean_urls(text) == "old [LINK: bit.ly] new [LINK: bit.ly]9 done"
+    assert clean_urls(text) == "old [LINK: bit.ly] new [LINK: bit.ly] done"
+
+
+def test_extractor_finds_the_same_urls():
+    for text in CORPUS:
+        assert get_url_extractor().find_urls(text, get_indices=True) == _baseline_extractor.find_urls(text, get_indices=True)
+
+
+def test_tld_pattern_is_factored():
+    """Fails when a urlextract release changes the private TLD pattern and the speed-up silently stops applying"""
+    assert get_url_extractor()._tlds_re.pattern.startswith("\\.(?:")
+
+
+def test_extractor_without_tld_pattern_falls_back_to_stock(monkeypatch):
+    class RenamedExtract:
+        """A urlextract release that keeps its TLD pattern somewhere else"""
+        def find_urls(self, text, **kwargs):
+            return _baseline_extractor.find_urls(text, **kwargs)
+
+    monkeypatch.setattr(text_utils, "URLExtract", RenamedExtract)
+    get_url_extractor.cache_clear()
+    try:
+        assert not hasattr(get_url_extractor(), "_tlds_re")
+        assert clean_urls(CORPUS[2]) == _baseline_clean_urls(CORPUS[2])
+    finally:
+        get_url_extractor.cache_clear()
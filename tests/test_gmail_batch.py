@@ -0,0 +1,102 @@
+import asyncio
+import json
+import re
+
+import httpx
+import pytest
+from aiogoogle.models import Request
+
+from panda.core.tools.gmail_batch import MAX_BATCH_SIZE, BatchError, GmailBatchClient, _decode_batch, _encode_batch
+
+BATCH_URL = "https://gmail.googleapis.com/batch/gmail/v1"
+
+
+def _get(message_id: str) -> Request:
+    return Request(
+        method="GET",
+        url=f"https://gmail.googleapis.com/gmail/v1/users/me/messages/{message_id}?format=full",
+        batch_url=BATCH_URL,
+    )
+
+
+def _batch_response(items: dict, boundary: str = "batch_reply") -> bytes:
+    """Multipart body answering {item index: (status line, json body)}, out of order like Google does"""
+    parts = []
+    for index, (status, body) in reversed(list(items.items())):
+        parts.append(
+            f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-item{index}>\r\n\r\n"
+            f"HTTP/1.1 {status}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n{json.dumps(body)}\r\n"
+        )
+    return ("".join(parts) + f"--{boundary}--").encode()
+
+
+def test_encode_batch():
+    body = _encode_batch([_get("a"), _get("b")], "xyz").decode()
+
+    assert body.split("\r\n") == [
+        "--xyz", "Content-Type: application/http", "Content-ID: <item0>", "",
+        "GET /gmail/v1/users/me/messages/a?format=full HTTP/1.1", "",
+        "--xyz", "Content-Type: application/http", "Content-ID: <item1>", "",
+        "GET /gmail/v1/users/me/messages/b?format=full HTTP/1.1", "",
+        "--xyz--",
+    ]
+
+
+def test_decode_batch_maps_items_by_content_id():
+    content = _batch_response({0: ("200 OK", {"id": "a"}), 1: ("404 Not Found", {"error": {"code": 404}})})
+    results = _decode_batch(content, 'multipart/mixed; boundary="batch_reply"')
+
+    assert results == {0: (200, {"id": "a"}), 1: (404, {"error": {"code": 404}})}
+
+
+def test_decode_batch_skips_malformed_parts():
+    content = _batch_response({0: ("200 OK", {"id": "a"}), 2: ("200 OK", {"id": "c"})}).decode()
+    content = content.replace("<response-item2>", "<response-itemX>")
+    content = content.replace(
+        "--batch_reply--",
+        "--batch_reply\r\nContent-ID: <response-item1>\r\n\r\nHTTP/1.1\r\n\r\n{}\r\n--batch_reply--",
+    )
+    results = _decode_batch(content.encode(), 'multipart/mixed; boundary="batch_reply"')
+
+    assert results == {0: (200, {"id": "a"})}
+
+
+def test_decode_batch_without_boundary():
+    with pytest.raises(BatchError):
+        _decode_batch(b"", "multipart/mixed")
+
+
+def test_send_round_trip_returns_bodies_in_request_order():
+    seen = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen["auth"] = request.headers["authorization"]
+        boundary = re.search(r"boundary=(\S+)", request.headers["content-type"]).group(1)
+        paths = re.findall(r"GET (\S+) HTTP/1.1", request.content.decode())
+        assert request.content.decode().count(f"--{boundary}") == len(paths) + 1
+        items = {}
+        for i, path in enumerate(paths):
+            message_id = path.rsplit("/", 1)[-1].split("?")[0]
+            items[i] = ("500 Internal Server Error", {}) if message_id == "m1" else ("200 OK", {"id": message_id})
+        return httpx.Response(200, content=_batch_response(items), headers={"Content-Type": "multipart/mixed; boundary=batch_reply"})
+
+    async def run():
+        client = GmailBatchClient()
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return client, await client.send([_get("m0"), _get("m1"), _get("m2")], {"access_token": "token"})
+        finally:
+            await client.aclose()
+
+    client, bodies = asyncio.run(run())
+
+    assert bodies == [{"id": "m0"}, None, {"id": "m2"}]
+    assert seen["auth"] == "Bearer token"
+    assert client.stats()["batches"] == 1
+    assert client.stats()["item_failures"] == 1
+
+
+def test_send_rejects_oversized_batches():
+    requests = [_get(str(i)) for i in range(MAX_BATCH_SIZE + 1)]
+    with pytest.raises(ValueError):
+        asyncio.run(GmailBatchClient().send(requests, {"access_token": "token"}))
@@ -0,0 +1,41 @@
+import asyncio
+from types import SimpleNamespace
+
+from panda import Config
+from panda.core.tools import gmail
+
+
+def _record(record_id, message_id):
+    return {"id": record_id, "messagesAdded": [{"message": {"id": message_id, "labelIds": ["INBOX", "UNREAD"]}}]}
+
+
+PAGES = {
+    None: {"history": [_record("101", "m1")], "nextPageToken": "p2", "historyId": "500"},
+    "p2": {"history": [_record("102", "m2")], "nextPageToken": "p3", "historyId": "500"},
+    "p3": {"history": [_record("103", "m3")], "historyId": "500"},
+}
+
+
+def _fake_gmail():
+    history = SimpleNamespace(list=lambda **params: params)
+    return SimpleNamespace(users=SimpleNamespace(history=history))
+
+
+def _list(monkeypatch, max_pages):
+    async def fake_call(aiogoogle, request, user_creds, rate_limiter=None):
+        return PAGES[request["pageToken"]]
+
+    monkeypatch.setattr(gmail, "_call", fake_call)
+    monkeypatch.setattr(Config, "GMAIL_HISTORY_MAX_PAGES", max_pages)
+    return asyncio.run(gmail.list_new_message_ids(None, _fake_gmail(), {}, history_id="100"))
+
+
+def test_complete_listing_returns_mailbox_history_id(monkeypatch):
+    assert _list(monkeypatch, max_pages=5) == (["m1", "m2", "m3"], "500")
+
+
+def test_truncated_listing_resumes_from_last_processed_record(monkeypatch):
+    ids, history_id = _list(monkeypatch, max_pages=2)
+
+    assert ids == ["m1", "m2"]
+    assert history_id == "102"
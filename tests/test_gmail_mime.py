@@ -0,0 +1,75 @@
+import base64
+
+import pytest
+
+import panda.utils.text as text
+from panda import Config
+from panda.core.tools.gmail import _extract_message_text
+
+
+def _data(content: str) -> str:
+    """Gmail's encoding: url-safe base64 without padding"""
+    return base64.urlsafe_b64encode(content.encode()).decode().rstrip("=")
+
+
+HTML = (
+    "<html><head><style>p{color:red}</style><script>var x = 1;</script></head>"
+    "<body><p>Hello <b>Ana</b>,</p><p>see <a href='https://ex.com/a'>https://ex.com/a</a> &amp; reply</p></body></html>"
+)
+HTML_TEXT = "Hello Ana , see [LINK: ex.com] & reply"
+
+FIXTURES = {
+    "html only": (
+        {"mimeType": "text/html", "body": {"data": _data(HTML)}},
+        HTML_TEXT,
+    ),
+    "alternative prefers plain": (
+        {"mimeType": "multipart/alternative", "body": {}, "parts": [
+            {"mimeType": "text/plain", "body": {"data": _data("Plain  version\nat https://zoom.us/j/1")}},
+            {"mimeType": "text/html", "body": {"data": _data(HTML)}},
+        ]},
+        "Plain version at [LINK: zoom.us]",
+    ),
+    "nested html with attachment": (
+        {"mimeType": "multipart/mixed", "body": {}, "parts": [
+            {"mimeType": "multipart/related", "body": {}, "parts": [
+                {"mimeType": "text/html", "body": {"data": _data(HTML)}},
+            ]},
+            {"mimeType": "application/pdf", "body": {"attachmentId": "att-1"}},
+        ]},
+        HTML_TEXT,
+    ),
+    "url-safe alphabet and utf-8": (
+        {"mimeType": "text/plain", "body": {"data": _data("café ??> ~~~ ümlaut")}},
+        "café ??> ~~~ ümlaut",
+    ),
+    "attachment only": (
+        {"mimeType": "multipart/mixed", "body": {}, "parts": [
+            {"mimeType": "application/pdf", "body": {"attachmentId": "att-1"}},
+        ]},
+        "",
+    ),
+}
+
+
+@pytest.fixture(params=["lxml", "html.parser"])
+def parser(request, monkeypatch):
+    if request.param == "lxml":
+        if text.lxml is None:
+            pytest.skip("lxml is not installed")
+    else:
+        monkeypatch.setattr(text, "lxml", None)
+    return request.param
+
+
+@pytest.mark.parametrize("name", FIXTURES)
+def test_extract_message_text(name, parser):
+    payload, expected = FIXTURES[name]
+    assert _extract_message_text(payload) == expected
+
+
+def test_long_bodies_are_truncated(monkeypatch):
+    monkeypatch.setattr(Config, "EMAIL_BODY_MAX_CHARS", 20)
+    payload = {"mimeType": "text/plain", "body": {"data": _data("word " * 100)}}
+
+    assert _extract_message_text(payload) == "word " * 4
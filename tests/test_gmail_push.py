@@ -0,0 +1,138 @@
+import asyncio
+import base64
+import json
+from types import SimpleNamespace
+
+from fastapi import FastAPI, Request
+
+from panda.core.tools import gmail_poller
+from panda.core.tools.gmail_poller import GmailPoller
+from panda.core.tools.gmail_push import FakePubSubPublisher, decode_notification, encode_notification
+
+
+def test_notification_round_trip():
+    envelope = encode_notification("Alice@Example.com", 4321)
+
+    assert envelope["subscription"] == "projects/local/subscriptions/gmail"
+    assert decode_notification(envelope) == ("alice@example.com", 4321)
+
+
+def test_decode_accepts_unpadded_data_and_string_history_ids():
+    data = base64.b64encode(json.dumps({"emailAddress": "bob@example.com", "historyId": "77"}).encode()).decode()
+    envelope = {"message": {"data": data.rstrip("=")}, "subscription": "projects/p/subscriptions/s"}
+
+    assert decode_notification(envelope) == ("bob@example.com", 77)
+
+
+def test_fake_publisher_posts_envelopes_to_the_app():
+    app = FastAPI()
+    received = []
+
+    @app.post("/gmail/push")
+    async def push(request: Request):
+        received.append((request.query_params.get("token"), decode_notification(await request.json())))
+        return {}
+
+    async def run():
+        publisher = FakePubSubPublisher(url="http://test/gmail/push", app=app, token="secret")
+        try:
+            return await publisher.publish("alice@example.com", 150)
+        finally:
+            await publisher.aclose()
+
+    assert asyncio.run(run()) == 200
+    assert received == [("secret", ("alice@example.com", 150))]
+
+
+def _poller(queue_size: int = 8) -> GmailPoller:
+    poller = GmailPoller()
+    poller._users = {
+        "alice": {"username": "alice", "gmail_address": "Alice@example.com", "gmail_history_id": "100"},
+        "bob": {"username": "bob", "gmail_address": "bob@example.com", "gmail_history_id": "100"},
+    }
+    poller._by_address = {"alice@example.com": "alice", "bob@example.com": "bob"}
+    poller._queue = asyncio.Queue(maxsize=queue_size)
+    return poller
+
+
+def test_notify_coalesces_a_burst_into_one_poll():
+    poller = _poller()
+
+    assert all(poller.notify("alice@example.com", 101 + i) for i in range(5))
+
+    assert poller._queue.qsize() == 1
+    assert poller._queue.get_nowait() == ("alice", False)
+    assert poller.stats()["push"]["received"] == 5
+    assert poller.stats()["push"]["skipped"] == 4
+
+
+def test_notify_queues_again_once_the_poll_has_started():
+    poller = _poller()
+    poller.notify("alice@example.com", 101)
+    poller._queue.get_nowait()
+    poller._pushed.discard("alice")  # what the worker does when it picks the poll up
+
+    poller.notify("alice@example.com", 102)
+
+    assert poller._queue.qsize() == 1
+
+
+def test_notify_skips_stale_and_unknown_mailboxes():
+    poller = _poller()
+
+    assert poller.notify("nobody@example.com", 500) is False
+    assert poller.notify("ALICE@example.com", 100) is True
+
+    assert poller._queue.empty()
+    assert poller.stats()["push"]["skipped"] == 1
+
+
+def test_notify_drops_when_the_queue_is_full():
+    poller = _poller(queue_size=1)
+
+    poller.notify("alice@example.com", 101)
+    poller.notify("bob@example.com", 101)
+
+    assert poller._queue.qsize() == 1
+    assert poller.stats()["push"]["dropped"] == 1
+    # bob's changes are left to the fallback poll, a later notification can still queue one
+    assert "bob" not in poller._pushed
+
+
+def _set_roster(monkeypatch, poller, usernames):
+    async def find(*args, **kwargs):
+        for username in usernames:
+            yield {"username": username}
+
+    collections = {gmail_poller.COLLECTIONS["users"]: SimpleNamespace(find=find)}
+    monkeypatch.setattr(gmail_poller, "mongo", SimpleNamespace(db=collections))
+    asyncio.run(poller.refresh_roster())
+
+
+def test_roster_churn_keeps_one_scheduled_poll_per_user(monkeypatch):
+    poller = GmailPoller()
+    poller._queue = asyncio.Queue()
+
+    _set_roster(monkeypatch, poller, ["alice"])
+    _set_roster(monkeypatch, poller, [])
+    _set_roster(monkeypatch, poller, ["alice"])
+
+    assert len(poller._due) == 1
+    assert poller._pop_due(float("inf")) == ["alice"]
+
+    # while alice's poll runs she leaves and comes back, only the worker reschedules her
+    _set_roster(monkeypatch, poller, [])
+    _set_roster(monkeypatch, poller, ["alice"])
+    poller._schedule("alice", poller.interval)
+
+    assert len(poller._due) == 1
+
+
+def test_pop_due_drops_stale_entries_and_departed_users():
+    poller = _poller()
+    poller._schedule("alice", 0)
+    poller._schedule("alice", 0)  # supersedes the first entry
+    poller._schedule("carol", 0)  # not on the roster any more
+
+    assert poller._pop_due(float("inf")) == ["alice"]
+    assert poller._scheduled == {"alice": None}
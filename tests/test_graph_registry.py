@@ -0,0 +1,58 @@
+import time
+
+import pytest
+
+from panda.agents.registry import GraphRegistry, graph_registry
+from panda.core.llm.config_manager import config_manager
+from panda.router.routes import PersonalAssistant
+
+
+def _counting_registry():
+    builds = []
+
+    def build():
+        builds.append(object())
+        return builds[-1]
+
+    return GraphRegistry({"agent": build}), builds
+
+
+def test_graph_is_compiled_once_per_config_version():
+    registry, builds = _counting_registry()
+
+    first = registry.get("agent")
+    assert registry.get("agent") is first
+    assert len(builds) == 1
+    assert registry.stats()["agent"]["builds"] == 1
+
+
+def test_config_change_rebuilds_and_drops_the_old_graph(monkeypatch):
+    registry, builds = _counting_registry()
+    first = registry.get("agent")
+
+    monkeypatch.setattr(config_manager, "version", config_manager.version + 1)
+    second = registry.get("agent")
+
+    assert second is not first
+    assert len(builds) == 2
+    assert list(registry._graphs) == [("agent", config_manager.version)]
+
+
+def test_unknown_graph_kind():
+    registry, _ = _counting_registry()
+    with pytest.raises(ValueError):
+        registry.get("missing")
+
+
+def test_assistants_share_the_compiled_graph():
+    graph = PersonalAssistant("alice").graph
+    builds = graph_registry.stats()["agent"]["builds"]
+
+    start = time.perf_counter()
+    for i in range(200):
+        assert PersonalAssistant(f"user-{i}").graph is graph
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    assert graph_registry.stats()["agent"]["builds"] == builds
+    # 200 lookups cost less than one compile did
+    assert elapsed_ms < graph_registry.stats()["agent"]["last_ms"]
@@ -0,0 +1,33 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from panda import Config
+from panda.agents.history import prepare_messages
+
+
+def _conversation(user_id: str, conversation_id: str, words: str) -> dict:
+    messages = []
+    for i in range(8):
+        messages += [HumanMessage(content=f"{words} question {i}"), AIMessage(content=f"{words} answer {i}")]
+    messages.append(HumanMessage(content="and now?"))
+    return {"user_id": user_id, "conversation_id": conversation_id, "messages": messages}
+
+
+def test_users_sharing_a_conversation_id_get_their_own_summary(monkeypatch):
+    monkeypatch.setattr(Config, "HISTORY_KEEP_TURNS", 1)
+    alice = prepare_messages("supervisor", _conversation("alice", "main", "alice secret"), record_stats=False)
+    bob = prepare_messages("supervisor", _conversation("bob", "main", "bob plans"), record_stats=False)
+
+    assert isinstance(bob[0], SystemMessage)
+    assert "alice" not in bob[0].content
+    assert "bob plans question 0" in bob[0].content
+    assert "alice secret question 0" in alice[0].content
+
+
+def test_summary_follows_the_folded_content(monkeypatch):
+    monkeypatch.setattr(Config, "HISTORY_KEEP_TURNS", 1)
+    first = prepare_messages("supervisor", _conversation("alice", "main", "before"), record_stats=False)
+    # same thread and fold point, different history (e.g. an edited conversation)
+    second = prepare_messages("supervisor", _conversation("alice", "main", "after"), record_stats=False)
+
+    assert "before question 0" in first[0].content
+    assert "after question 0" in second[0].content
@@ -0,0 +1,43 @@
+import pytest
+
+from panda.agents.prerouter import PreRouter, evaluate
+
+
+def test_labelled_corpus_has_no_mistakes():
+    report = evaluate()
+
+    assert report["mistakes"] == []
+    assert report["accuracy"] == 1.0
+    assert report["coverage"] >= 0.6
+
+
+@pytest.mark.parametrize("text", [
+    "I look forward to it",
+    "I read a great book yesterday",
+    "my support tickets are piling up",
+    "she trains dogs",
+    "I enjoyed meeting you",
+])
+def test_single_keyword_is_left_to_the_llm(text):
+    agent, _ = PreRouter().route(text)
+    assert agent is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("book a flight to Rome", "booking_agent"),
+    ("reserve a table for four tonight", "booking_agent"),
+    ("check my inbox", "email_agent"),
+    ("schedule a meeting with Ana on Monday", "scheduler_agent"),
+    ("remind me to water the plants", "scheduler_agent"),
+    ("hello", "chitchat_agent"),
+])
+def test_action_with_object_skips_the_llm(text, expected):
+    agent, _ = PreRouter().route(text)
+    assert agent == expected
+
+
+def test_competing_intents_are_left_to_the_llm():
+    agent, guess = PreRouter().route("check my emails and schedule a meeting with the sender")
+    assert agent is None
+    assert guess in {"email_agent", "scheduler_agent"}
+
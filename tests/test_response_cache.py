@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+from panda import Config
+from panda.agents.nodes import all_nodes
+from panda.core.llm.factory import LLMFactory
+from panda.core.llm.response_cache import ResponseCache
+from panda.models.agents.response import ChitChatResponse, SupervisorRouterResponse
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    """Fresh cache and fake LLMs counting their calls per agent"""
+    calls = {}
+
+    def get_agent_llm(agent_name, schema=None):
+        async def run(_):
+            calls[agent_name] = calls.get(agent_name, 0) + 1
+            if agent_name == "supervisor":
+                return SupervisorRouterResponse(next_agent="chitchat_agent")
+            return ChitChatResponse(response_text="Here is one.", next_agent="END")
+        return RunnableLambda(run)
+
+    monkeypatch.setattr(LLMFactory, "get_agent_llm", staticmethod(get_agent_llm))
+    monkeypatch.setattr(all_nodes, "response_cache", ResponseCache())
+    monkeypatch.setattr(Config, "PREROUTER_ENABLED", False)
+    return calls
+
+
+def _state(user_id: str, conversation_id: str, *messages) -> dict:
+    return {"user_id": user_id, "conversation_id": conversation_id, "messages": list(messages), "run_id": conversation_id}
+
+
+def test_routing_is_shared_across_conversations_and_users(llm_calls):
+    asyncio.run(all_nodes.supervisor_node(_state("alice", "c1", HumanMessage(content="Tell me a joke!"))))
+    asyncio.run(all_nodes.supervisor_node(_state("alice", "c2", HumanMessage(content="tell me a joke"))))
+    asyncio.run(all_nodes.supervisor_node(_state("bob", "main", HumanMessage(content="Tell me a joke"))))
+
+    assert llm_calls["supervisor"] == 1
+    assert all_nodes.response_cache.stats()["hits"] == 2
+
+
+def test_routing_depends_on_the_history_the_supervisor_sees(llm_calls):
+    history = [HumanMessage(content="book a trip to Rome"), AIMessage(content="Which dates?")]
+    asyncio.run(all_nodes.supervisor_node(_state("alice", "c1", HumanMessage(content="next week"))))
+    asyncio.run(all_nodes.supervisor_node(_state("alice", "c2", *history, HumanMessage(content="next week"))))
+
+    assert llm_calls["supervisor"] == 2
+
+
+def test_replies_are_reused_for_the_same_user_only(llm_calls):
+    asyncio.run(all_nodes.chitchat_agent_node(_state("alice", "c1", HumanMessage(content="Tell me a joke"))))
+    # later in another conversation, with history in between
+    asyncio.run(all_nodes.chitchat_agent_node(_state(
+        "alice", "c2", HumanMessage(content="hi"), AIMessage(content="Hello!"), HumanMessage(content="tell me a joke!")
+    )))
+    asyncio.run(all_nodes.chitchat_agent_node(_state("bob", "c1", HumanMessage(content="Tell me a joke"))))
+
+    assert llm_calls["chitchat_agent"] == 2
+    assert all_nodes.response_cache.stats()["hits"] == 1